@@ -0,0 +1,166 @@
+import os
+import json
+import argparse
+import numpy as np
+from scipy import linalg
+from skgstat import Variogram, OrdinaryKriging
+from covariance import Covariance, ok_matrix
+from local_kriging import LocalKriging
+
+MODEL_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'model'))
+MANIFEST = 'manifest.json'
+ARTIFACT_FORMAT = 'kriging-artifact'
+ARTIFACT_VERSION = 1
+KINDS = ['local', 'global']
+
+
+# Ordinary kriging over all wells from a stored inverse of the full system. The
+# inverse and the dual weights inverse @ [z; 0] are usually read-only memmaps of
+# an artifact, so every process serving the model shares the same pages.
+# Follows the skgstat OrdinaryKriging interface (transform, sigma).
+class GlobalKriging:
+    def __init__(self, coords, values, covariance, inverse, weights, chunk_size=2_000):
+        self.coords = coords
+        self.values = values
+        self.covariance = covariance
+        self.inverse = inverse
+        self.weights = weights
+        self.chunk_size = chunk_size
+        self.sigma = None
+
+    # Inverse of the jittered OK system and its dual weights
+    @staticmethod
+    def factorize(coords, values, covariance, jitter=1e-8):
+        inverse = linalg.inv(ok_matrix(coords, covariance, jitter), overwrite_a=True, check_finite=False)
+        return inverse, inverse[:, :-1] @ values
+
+    # Predictions at the (x, y) targets; the kriging variances are left in self.sigma
+    def transform(self, x, y):
+        targets = np.column_stack((np.ravel(x), np.ravel(y))).astype(np.float64)
+        n = len(self.values)
+        field = np.empty(len(targets))
+        sigma = np.empty(len(targets))
+        for start in range(0, len(targets), self.chunk_size):
+            stop = start + self.chunk_size
+            rhs = np.ones((len(targets[start:stop]), n + 1))
+            rhs[:, :n] = self.covariance.cross(targets[start:stop], self.coords)
+            field[start:stop] = rhs @ self.weights
+            sigma[start:stop] = self.covariance.total_sill - np.einsum('ij,ij->i', rhs @ self.inverse, rhs)
+        self.sigma = sigma
+        return field
+
+
+# Training wells, values and covariance of a skgstat OrdinaryKriging, Variogram
+# or LocalKriging, plus the local neighbourhood size if it has one
+def _model_parts(model):
+    if isinstance(model, OrdinaryKriging):
+        covariance = Covariance.from_parameters(model._model_name, model._model_coef, model.sill, model.nugget)
+        return model.coords.coords, model.values, covariance, model._maxp
+    if isinstance(model, Variogram):
+        return model.coordinates, model.values, Covariance.from_variogram(model), None
+    if isinstance(model, (LocalKriging, GlobalKriging)):
+        return model.coords, model.values, model.covariance, getattr(model, 'k', None)
+    raise TypeError(f'cannot save a {type(model).__name__} as a kriging artifact')
+
+
+def _write_array(path, name, array):
+    file = f'{name}.npy'
+    tmp_path = os.path.join(path, f'.{file}.tmp')
+    with open(tmp_path, 'wb') as f:
+        np.save(f, np.ascontiguousarray(array))
+    os.replace(tmp_path, os.path.join(path, file))
+    return {'file': file, 'shape': list(array.shape), 'dtype': str(array.dtype)}
+
+
+# Save a fitted ordinary kriging model as an artifact directory: one .npy per
+# array and a JSON manifest with the format version, the variogram model and
+# coefficients and the kriging settings.
+#   kind='local'  k nearest wells per target (default for OrdinaryKriging / LocalKriging)
+#   kind='global' all wells, with the factorized (inverted) system stored
+# Arrays are replaced atomically and the manifest is written last, so a reader
+# never sees a half-written artifact.
+def save_artifact(model, path, kind=None, k=None, jitter=1e-8):
+    coords, values, covariance, model_k = _model_parts(model)
+    if covariance.parameters is None:
+        raise ValueError('only the variogram models in covariance.VARIOGRAM_MODELS can be saved')
+    kind = kind or ('local' if model_k else 'global')
+    if kind not in KINDS:
+        raise ValueError(f'kind must be one of {KINDS}, got {kind!r}')
+
+    coords = np.asarray(coords, dtype=np.float64)
+    values = np.asarray(values, dtype=np.float64).ravel()
+    os.makedirs(path, exist_ok=True)
+    arrays = {'coords': _write_array(path, 'coords', coords),
+              'values': _write_array(path, 'values', values)}
+    if kind == 'global':
+        inverse, weights = GlobalKriging.factorize(coords, values, covariance, jitter)
+        arrays['inverse'] = _write_array(path, 'inverse', inverse)
+        arrays['weights'] = _write_array(path, 'weights', weights)
+
+    manifest = {
+        'format': ARTIFACT_FORMAT,
+        'version': ARTIFACT_VERSION,
+        'kind': kind,
+        'source': type(model).__name__,
+        'covariance': dict(covariance.parameters, sill=covariance.sill, nugget=covariance.nugget),
+        'k': int(k or model_k or 15) if kind == 'local' else None,
+        'jitter': jitter,
+        'arrays': arrays,
+    }
+    tmp_path = os.path.join(path, f'.{MANIFEST}.tmp')
+    with open(tmp_path, 'w') as file:
+        json.dump(manifest, file, indent=2)
+    os.replace(tmp_path, os.path.join(path, MANIFEST))
+    return manifest
+
+
+def read_manifest(path):
+    with open(os.path.join(path, MANIFEST)) as file:
+        manifest = json.load(file)
+    if manifest.get('format') != ARTIFACT_FORMAT:
+        raise ValueError(f'{path} is not a kriging artifact')
+    if manifest['version'] > ARTIFACT_VERSION:
+        raise ValueError(f'{path} has artifact version {manifest["version"]}, '
+                         f'this code reads up to {ARTIFACT_VERSION}')
+    return manifest
+
+
+# Model of an artifact directory, with its arrays memory-mapped (mmap_mode='r')
+# rather than read: LocalKriging for 'local' artifacts, GlobalKriging for 'global'
+def load_artifact(path, mmap_mode='r'):
+    manifest = read_manifest(path)
+    arrays = {name: np.load(os.path.join(path, entry['file']), mmap_mode=mmap_mode)
+              for name, entry in manifest['arrays'].items()}
+    parameters = manifest['covariance']
+    covariance = Covariance.from_parameters(parameters['model'], parameters['cof'],
+                                            parameters['sill'], parameters['nugget'])
+
+    if manifest['kind'] == 'local':
+        return LocalKriging(arrays['coords'], arrays['values'], covariance,
+                            k=manifest['k'], jitter=manifest['jitter'])
+    return GlobalKriging(arrays['coords'], arrays['values'], covariance, arrays['inverse'], arrays['weights'])
+
+
+# Convert an existing dill pickle of an ordinary kriging model
+def convert_pickle(pickle_path, path=None, kind=None):
+    import dill as pickle
+    with open(pickle_path, 'rb') as file:
+        model = pickle.load(file)
+    path = path or os.path.splitext(pickle_path)[0]
+    return path, save_artifact(model, path, kind)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Convert pickled ordinary kriging models to artifacts.')
+    parser.add_argument('models', nargs='+', help='dill pickles, e.g. ../model/tuned_ordinary.pkl')
+    parser.add_argument('--kind', choices=KINDS, default=None)
+    args = parser.parse_args(argv)
+
+    for pickle_path in args.models:
+        path, manifest = convert_pickle(pickle_path, kind=args.kind)
+        print(f'{path}: {manifest["kind"]} {manifest["covariance"]["model"]}, '
+              f'{manifest["arrays"]["values"]["shape"][0]} wells')
+
+
+if __name__ == '__main__':
+    main()
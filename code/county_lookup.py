@@ -0,0 +1,57 @@
+import os
+import json
+import numpy as np
+import pandas as pd
+import shapely
+from shapely.geometry import shape
+
+COUNTIES_PATH = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'new_york_counties.json'))
+
+
+# County polygons from new_york_counties.json, prepared and indexed in an STRtree,
+# answering point-in-county for whole coordinate arrays at once
+class CountyLookup:
+    def __init__(self, geojson=COUNTIES_PATH):
+        if isinstance(geojson, str):
+            with open(geojson) as f:
+                geojson = json.load(f)
+
+        features = geojson['features']
+        self.geometries = np.array([shape(feature['geometry']) for feature in features])
+        self.properties = pd.DataFrame([feature['properties'] for feature in features])
+        shapely.prepare(self.geometries)
+        self.tree = shapely.STRtree(self.geometries)
+
+    # Row of self.properties containing each (lon, lat) point, -1 outside every county.
+    # Points on a shared border belong to neither county, as with sjoin(op='within').
+    def lookup(self, lon, lat):
+        lon, lat = np.ravel(lon).astype(np.float64), np.ravel(lat).astype(np.float64)
+        index = np.full(len(lon), -1, dtype=np.int64)
+        if len(lon) == 0:
+            return index
+
+        # One bulk query gives every (point, county) pair whose envelopes meet, and one
+        # vectorized test against the prepared polygons keeps the points strictly inside
+        # (as predicate='within'). A point inside overlapping polygons keeps the first county.
+        points, rows = self.tree.query(shapely.points(lon, lat))
+        inside = shapely.contains_xy(self.geometries[rows], lon[points], lat[points])
+        points, rows = points[inside], rows[inside]
+        order = np.lexsort((rows, points))
+        points, rows = points[order], rows[order]
+        first = np.unique(points, return_index=True)[1]
+        index[points[first]] = rows[first]
+        return index
+
+    # County properties (e.g. GEOID, NAME) for each point, NaN outside the state
+    def counties(self, lon, lat, columns=('GEOID', 'NAME')):
+        index = self.lookup(lon, lat)
+        found = self.properties[list(columns)].reindex(np.where(index >= 0, index, len(self.properties)))
+        return found.reset_index(drop=True)
+
+    # Copy of df with the county columns of its lon/lat points added. Columns df
+    # already has keep their values for points outside every county.
+    def assign(self, df, lon='longitude', lat='latitude', columns=('GEOID', 'NAME')):
+        found = self.counties(df[lon].values, df[lat].values, columns)
+        found.index = df.index
+        return df.assign(**{column: found[column].fillna(df[column]) if column in df else found[column]
+                            for column in columns})
@@ -0,0 +1,113 @@
+import numpy as np
+from scipy.spatial.distance import cdist, pdist, squareform
+
+
+# Array versions of the skgstat.models functions (which evaluate one lag at a time)
+def _spherical(h, r, c0, b=0.0):
+    return b + c0 * np.where(h <= r, 1.5 * (h / r) - 0.5 * (h / r) ** 3, 1.0)
+
+
+def _exponential(h, r, c0, b=0.0):
+    return b + c0 * (1. - np.exp(-(h / (r / 3.))))
+
+
+def _gaussian(h, r, c0, b=0.0):
+    return b + c0 * (1. - np.exp(-(h ** 2 / (r / 2.) ** 2)))
+
+
+def _cubic(h, r, c0, b=0.0):
+    u = h / r
+    return b + c0 * np.where(h < r, 7 * u ** 2 - 35 / 4 * u ** 3 + 7 / 2 * u ** 5 - 3 / 4 * u ** 7, 1.0)
+
+
+def _stable(h, r, c0, s, b=0.0):
+    a = r / np.power(3, 1 / s)
+    return np.where(h == 0, b, b + c0 * (1. - np.exp(-np.power(h / a, s))))
+
+
+VARIOGRAM_MODELS = {
+    'spherical': _spherical,
+    'exponential': _exponential,
+    'gaussian': _gaussian,
+    'cubic': _cubic,
+    'stable': _stable,
+}
+
+
+# Semivariance function of one of VARIOGRAM_MODELS with skgstat-ordered coefficients
+# [range, sill, (shape), (nugget)]
+def model_function(model, cof):
+    function = VARIOGRAM_MODELS[model]
+    cof = [float(value) for value in cof]
+    return lambda h: function(np.asarray(h, dtype=np.float64), *cof)
+
+
+# Semivariance function of a fitted skgstat variogram, vectorized where the model allows
+def variogram_function(variogram):
+    model = variogram.describe(short=True)['model']
+    if model not in VARIOGRAM_MODELS:
+        return variogram.fitted_model
+    return model_function(model, variogram.cof)
+
+
+# Covariance function C(h) = (sill + nugget) - gamma(h) of a fitted skgstat variogram.
+# gamma(0) is taken as 0, so C(0) is the total sill (the nugget applies off the diagonal).
+# parameters holds the model name and coefficients when gamma is one of
+# VARIOGRAM_MODELS, which is what lets the covariance be saved and rebuilt.
+class Covariance:
+    def __init__(self, gamma, sill, nugget=0.0, parameters=None):
+        self.gamma = gamma
+        self.sill = float(sill)
+        self.nugget = float(nugget)
+        self.total_sill = self.sill + self.nugget
+        self.parameters = parameters
+
+    @classmethod
+    def from_parameters(cls, model, cof, sill, nugget=0.0):
+        return cls(model_function(model, cof), sill, nugget,
+                   {'model': model, 'cof': [float(value) for value in cof]})
+
+    @classmethod
+    def from_variogram(cls, variogram):
+        description = variogram.describe(short=True)
+        if description['model'] in VARIOGRAM_MODELS:
+            return cls.from_parameters(description['model'], variogram.cof,
+                                       description['sill'], description['nugget'])
+        return cls(variogram.fitted_model, description['sill'], description['nugget'])
+
+    def __call__(self, h):
+        h = np.asarray(h, dtype=np.float64)
+        covariance = self.total_sill - self.gamma(h.ravel()).reshape(h.shape)
+        return np.where(h == 0, self.total_sill, covariance)
+
+    # Covariance matrix between all points of coords (zero distances off the
+    # diagonal are coincident wells and keep the nugget)
+    def matrix(self, coords):
+        covariance = squareform(self.total_sill - self.gamma(pdist(coords)))
+        np.fill_diagonal(covariance, self.total_sill)
+        return covariance
+
+    # matrix for a stack of point sets, (m, k, 2) -> (m, k, k)
+    def matrices(self, points):
+        h = np.sqrt(((points[:, :, None, :] - points[:, None, :, :]) ** 2).sum(axis=-1))
+        covariance = self.total_sill - self.gamma(h.ravel()).reshape(h.shape)
+        diagonal = np.arange(points.shape[1])
+        covariance[:, diagonal, diagonal] = self.total_sill
+        return covariance
+
+    # Covariance between every target and every sample point, (n_targets, n_samples)
+    def cross(self, targets, coords):
+        return self(cdist(targets, coords))
+
+
+# Ordinary kriging system in covariance form: [[C, 1], [1', 0]]. jitter adds that
+# fraction of the total sill to the diagonal, which keeps coincident wells solvable.
+def ok_matrix(coords, covariance, jitter=0.0):
+    n = len(coords)
+    system = np.empty((n + 1, n + 1))
+    system[:n, :n] = covariance.matrix(coords)
+    system[np.arange(n), np.arange(n)] += jitter * covariance.total_sill
+    system[:n, n] = 1.0
+    system[n, :n] = 1.0
+    system[n, n] = 0.0
+    return system
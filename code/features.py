@@ -0,0 +1,63 @@
+import os
+import numpy as np
+from scipy import sparse
+from sklearn.compose import ColumnTransformer
+from sklearn.preprocessing import OneHotEncoder, StandardScaler
+
+FEATURES_PATH = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'encoded_gaswells.npz'))
+
+NUMERICAL = ['gas_prod', 'longitude', 'latitude']
+IMPERIAL = ['depth', 'elevation']
+CATEGORICAL = ['well', 'status', 'field', 'geology']
+
+TARGET = 'num__gas_prod'
+COORDINATES = ['num__longitude', 'num__latitude']
+
+
+# ColumnTransformer of model_development.ipynb with a sparse one-hot block; the
+# whole output stays CSR whatever the number of field/geology categories
+def build_preprocessor():
+    return ColumnTransformer(
+        transformers=[
+            ('num', 'passthrough', NUMERICAL),
+            ('imp', StandardScaler(), IMPERIAL),
+            ('cat', OneHotEncoder(sparse_output=True), CATEGORICAL)],
+        sparse_threshold=1.0)
+
+
+# Encode the (detrended) well table into a CSR matrix and its feature names
+def encode_features(df):
+    preprocessor = build_preprocessor()
+    matrix = sparse.csr_matrix(preprocessor.fit_transform(df), dtype=np.float64)
+    return matrix, np.asarray(preprocessor.get_feature_names_out(), dtype=str)
+
+
+# One compressed .npz holding the CSR arrays and the feature-name index
+def save_features(matrix, feature_names, path=FEATURES_PATH):
+    matrix = sparse.csr_matrix(matrix)
+    np.savez_compressed(path, data=matrix.data, indices=matrix.indices, indptr=matrix.indptr,
+                        shape=np.array(matrix.shape), feature_names=np.asarray(feature_names, dtype=str))
+
+
+def load_features(path=FEATURES_PATH):
+    with np.load(path) as bundle:
+        matrix = sparse.csr_matrix((bundle['data'], bundle['indices'], bundle['indptr']),
+                                   shape=tuple(bundle['shape']))
+        feature_names = bundle['feature_names']
+    return matrix, feature_names
+
+
+# Dense copies of a few named columns, (n_rows, len(columns))
+def dense_columns(matrix, feature_names, columns):
+    positions = [int(np.flatnonzero(feature_names == column)[0]) for column in columns]
+    return matrix[:, positions].toarray()
+
+
+# Predictors (CSR, everything but target and coordinates), coordinates and target
+def split_features(matrix, feature_names):
+    excluded = [TARGET] + COORDINATES
+    predictors = np.flatnonzero(~np.isin(feature_names, excluded))
+    coords = dense_columns(matrix, feature_names, COORDINATES)
+    target = dense_columns(matrix, feature_names, [TARGET]).ravel()
+    return matrix[:, predictors], coords, target, feature_names[predictors]
+
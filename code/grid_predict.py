@@ -0,0 +1,122 @@
+import os
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import dill as pickle
+from artifact import load_artifact
+
+GRID_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'grid_prediction'))
+# New York State bounding box (lon_min, lat_min, lon_max, lat_max)
+NYS_BOUNDS = (-79.77, 40.49, -71.85, 45.02)
+
+# Set once per worker process by _init_worker
+_model = None
+_output_dir = None
+
+
+# Grid axes over (lon_min, lat_min, lon_max, lat_max), as np.mgrid[...:nj] would give
+def grid_axes(bounds, shape):
+    lon_min, lat_min, lon_max, lat_max = bounds
+    return np.linspace(lon_min, lon_max, shape[0]), np.linspace(lat_min, lat_max, shape[1])
+
+
+# Bounds of the sample coordinates, the extent the notebooks predict over
+def sample_bounds(coords):
+    return coords[:, 0].min(), coords[:, 1].min(), coords[:, 0].max(), coords[:, 1].max()
+
+
+# (x slice, y slice) of every tile of a grid
+def grid_tiles(shape, tile_size):
+    return [(slice(i, min(i + tile_size, shape[0])), slice(j, min(j + tile_size, shape[1])))
+            for i in range(0, shape[0], tile_size) for j in range(0, shape[1], tile_size)]
+
+
+# Prediction and kriging variance at points, for skgstat (transform / sigma)
+# and pykrige (execute) models
+def predict_points(model, x, y):
+    if hasattr(model, 'transform'):
+        field = model.transform(x, y)
+        return field, model.sigma
+    field, sigma = model.execute('points', x, y)
+    return np.asarray(field), np.asarray(sigma)
+
+
+def _array_path(output_dir, name):
+    return os.path.join(output_dir, f'{name}.npy')
+
+
+# model_ref is an artifact directory (memory-mapped by every worker) or pickled model bytes
+def _init_worker(model_ref, output_dir):
+    global _model, _output_dir
+    _model = load_artifact(model_ref) if isinstance(model_ref, str) else pickle.loads(model_ref)
+    _output_dir = output_dir
+
+
+# Krige one tile and write it straight into the on-disk arrays
+def _predict_tile(task):
+    x, y, x_slice, y_slice = task
+    xx, yy = np.meshgrid(x, y, indexing='ij')
+    field, sigma = predict_points(_model, xx.ravel(), yy.ravel())
+
+    for name, values in (('field', field), ('sigma', sigma)):
+        array = np.load(_array_path(_output_dir, name), mmap_mode='r+')
+        array[x_slice, y_slice] = np.reshape(values, xx.shape)
+        array.flush()
+        del array
+    return x_slice, y_slice
+
+
+# Predict a kriging model over the x by y grid in tile_size x tile_size tiles across
+# a process pool. model may also be an artifact directory (see artifact.py), which
+# every worker memory-maps instead of unpickling its own copy. Each worker holds
+# one tile in memory and writes it into
+# output_dir/field.npy and sigma.npy, laid out like model.transform(xx.flatten(),
+# yy.flatten()).reshape(xx.shape) for xx, yy = np.mgrid[...]. Returns both arrays
+# memory-mapped read-only.
+def predict_grid(model, x, y, output_dir=GRID_DIR, tile_size=256, workers=None, dtype=np.float32):
+    x, y = np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64)
+    shape = (len(x), len(y))
+    os.makedirs(output_dir, exist_ok=True)
+    for name in ('field', 'sigma'):
+        array = np.lib.format.open_memmap(_array_path(output_dir, name), 'w+', dtype, shape)
+        array[:] = np.nan
+        array.flush()
+        del array
+
+    model_ref = model if isinstance(model, str) else pickle.dumps(model)
+    tasks = [(x[x_slice], y[y_slice], x_slice, y_slice) for x_slice, y_slice in grid_tiles(shape, tile_size)]
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(model_ref, output_dir)) as executor:
+        for _ in executor.map(_predict_tile, tasks):
+            pass
+
+    return load_grid(output_dir)
+
+
+def load_grid(output_dir=GRID_DIR):
+    return (np.load(_array_path(output_dir, 'field'), mmap_mode='r'),
+            np.load(_array_path(output_dir, 'sigma'), mmap_mode='r'))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Predict a saved kriging model over a grid.')
+    parser.add_argument('model', help='kriging artifact directory, or dill pickle of a skgstat or pykrige model')
+    parser.add_argument('--shape', type=int, nargs=2, default=(2000, 2000), metavar=('NX', 'NY'))
+    parser.add_argument('--bounds', type=float, nargs=4, default=NYS_BOUNDS,
+                        metavar=('LON_MIN', 'LAT_MIN', 'LON_MAX', 'LAT_MAX'))
+    parser.add_argument('--output', default=GRID_DIR)
+    parser.add_argument('--tile-size', type=int, default=256)
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args(argv)
+
+    model = args.model
+    if not os.path.isdir(model):
+        with open(model, 'rb') as file:
+            model = pickle.load(file)
+    x, y = grid_axes(args.bounds, args.shape)
+    field, sigma = predict_grid(model, x, y, args.output, args.tile_size, args.workers)
+    print(f'{args.output}: field {field.shape}, {np.isnan(field).sum()} cells without a prediction')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,322 @@
+import os
+import glob
+import json
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
+
+# Data files resolved from this file (like dashboard/well_store.py), so the CLI runs from any directory
+DATA_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data'))
+PROD_DIR = os.path.join(DATA_DIR, 'data_source', 'oilgas_prod')
+WELLS_PATH = os.path.join(DATA_DIR, 'oilgas_wells.csv')
+CLEAN_PATH = os.path.join(DATA_DIR, 'clean_gaswells.csv')
+STATE_DIR = os.path.join(DATA_DIR, 'ingest_state')
+
+# Only the columns the model uses are ever parsed, with their dtypes declared up front
+PROD_DTYPES = {'API_WellNo': 'int64', 'GasProd': 'float64', 'Year': 'int16'}
+WELL_DTYPES = {
+    'API_WellNo': 'int64',
+    'Location_Verified': 'str',
+    'Well_Type': 'str',
+    'Well_Status': 'str',
+    'True_vertical_depth': 'float64',
+    'Elevation': 'float64',
+    'Bottom_hole_longitude': 'float64',
+    'Bottom_hole_latitude': 'float64',
+    'Producing_name': 'str',
+    'Producing_formation': 'str',
+}
+
+# Kept codes and their labels (codes without a label become NaN, as in data_preparation.ipynb)
+WELL_TYPE_CODES = ['OD', 'GD', 'DW', 'OW', 'GW', 'OE', 'DH', 'GE']
+WELL_TYPES = {
+    'OD': 'oil development',
+    'GD': 'gas development',
+    'OW': 'oil wildcat',
+    'GE': 'gas extension',
+    'DW': 'dry wildcat',
+    'GW': 'gas wildcat',
+    'OE': 'oil extension'}
+
+WELL_STATUS_CODES = ['AC', 'DC', 'DD', 'DG', 'IN', 'SI', 'TA', 'CO', 'PB', 'PM', 'PA', 'TR']
+WELL_STATUSES = {
+    'IN': 'inactive',
+    'AC': 'active',
+    'PA': 'plugged abandoned',
+    'SI': 'shut in',
+    'DC': 'drilling complete'}
+
+CLEAN_COLUMNS = {
+    'GasProd': 'gas_prod',
+    'Well_Type': 'well',
+    'Well_Status': 'status',
+    'True_vertical_depth': 'depth',
+    'Elevation': 'elevation',
+    'Bottom_hole_longitude': 'longitude',
+    'Bottom_hole_latitude': 'latitude',
+    'Producing_name': 'field',
+    'Producing_formation': 'geology'}
+
+
+# Yearly production files, oldest first
+def production_files(prod_dir=PROD_DIR):
+    paths = sorted(glob.glob(os.path.join(prod_dir, 'Prod*.csv')))
+    if not paths:
+        raise FileNotFoundError(f'no Prod<year>.csv production files in {prod_dir}')
+    return paths
+
+
+# One yearly file, pruned to the used columns and to rows that produced gas
+def read_production_file(path):
+    prod = pd.read_csv(path, usecols=list(PROD_DTYPES), dtype=PROD_DTYPES)
+    return prod[prod['GasProd'] > 0]
+
+
+# Per-well contribution of one yearly file: summed GasProd and latest Year
+def production_partial(path):
+    prod = read_production_file(path)
+    return prod.groupby('API_WellNo').agg(GasProd=('GasProd', 'sum'), Year=('Year', 'max')).reset_index()
+
+
+# Partials for several files, parsed in parallel (each worker returns only its per-well sums)
+def read_production_partials(paths, workers=None):
+    if workers == 1 or len(paths) < 2:
+        return [production_partial(path) for path in paths]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(production_partial, paths))
+
+
+# Fold per-file partials into one row per well
+def combine_partials(partials):
+    if not partials:
+        raise ValueError('no production partials to combine')
+    combined = pd.concat(partials, ignore_index=True)
+    return combined.groupby('API_WellNo').agg(GasProd=('GasProd', 'sum'), Year=('Year', 'max'))
+
+
+# Well inventory read in chunks; location, coordinate, type and status filters are applied per chunk
+def read_wells(path=WELLS_PATH, chunksize=100_000):
+    frames = []
+    for chunk in pd.read_csv(path, usecols=list(WELL_DTYPES), dtype=WELL_DTYPES, chunksize=chunksize):
+        keep = (
+            (chunk['Location_Verified'].str.strip() == 'YES') &
+            (chunk['Bottom_hole_longitude'] != 0) &
+            (chunk['Bottom_hole_latitude'] != 0) &
+            (chunk['True_vertical_depth'] != 0) &
+            chunk['Well_Type'].isin(WELL_TYPE_CODES) &
+            chunk['Well_Status'].isin(WELL_STATUS_CODES))
+        frames.append(chunk.loc[keep].drop(columns='Location_Verified'))
+    if not frames:
+        raise ValueError(f'{path} has no well rows')
+
+    wells = pd.concat(frames, ignore_index=True)
+    wells['Well_Type'] = wells['Well_Type'].map(WELL_TYPES)
+    wells['Well_Status'] = wells['Well_Status'].map(WELL_STATUSES)
+    return wells
+
+
+# One row per API_WellNo: attributes of the first listing, deepest TVD and the number of listings
+def well_attributes(wells):
+    attributes = wells.drop_duplicates('API_WellNo', keep='first').set_index('API_WellNo')
+    grouped = wells.groupby('API_WellNo')
+    attributes['True_vertical_depth'] = grouped['True_vertical_depth'].max()
+    attributes['listings'] = grouped.size()
+    return attributes
+
+
+# Join per-well production totals with the well attributes. This reproduces the
+# notebook's join-then-groupby: total GasProd (counted once per well listing), deepest
+# TVD and every other attribute from the latest production year.
+def aggregate_wells(attributes, totals):
+    df = attributes.join(totals[['GasProd', 'Year']], how='inner').sort_index()
+    df['GasProd'] = df['GasProd'] * df.pop('listings')
+    df = df.reset_index()[['API_WellNo', 'GasProd', 'Well_Type', 'Well_Status', 'True_vertical_depth',
+                           'Elevation', 'Bottom_hole_longitude', 'Bottom_hole_latitude',
+                           'Producing_name', 'Producing_formation', 'Year']]
+    return df.sort_values('Year', kind='stable')
+
+
+# Fill missing elevations from wells with a known elevation within `radius` degrees on
+# both axes (the +-0.095 degree box of data_preparation.ipynb). All missing wells are
+# answered by one batched KD-tree query; method='idw' weights neighbours by 1 / distance**power.
+def impute_elevation(df, radius=0.095, method='mean', power=2, workers=-1):
+    coords = df[['Bottom_hole_longitude', 'Bottom_hole_latitude']].values
+    elevation = df['Elevation'].values.astype(float)
+    known = ~np.isnan(elevation)
+    missing = np.flatnonzero(~known)
+    if len(missing) == 0 or not known.any():
+        return pd.Series(elevation, index=df.index)
+
+    known_coords, known_elevation = coords[known], elevation[known]
+    tree = cKDTree(known_coords)
+    neighbors = tree.query_ball_point(coords[missing], r=radius, p=np.inf, workers=workers)
+
+    counts = np.fromiter((len(n) for n in neighbors), dtype=np.int64, count=len(neighbors))
+    flat = np.concatenate([np.asarray(n, dtype=np.int64) for n in neighbors])
+    owner = np.repeat(np.arange(len(missing)), counts)
+
+    if method == 'idw':
+        distance = np.hypot(*(known_coords[flat] - coords[missing][owner]).T)
+        weights = 1.0 / np.maximum(distance, 1e-12) ** power
+    else:
+        weights = np.ones(len(flat))
+
+    totals = np.bincount(owner, weights=weights * known_elevation[flat], minlength=len(missing))
+    norms = np.bincount(owner, weights=weights, minlength=len(missing))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        elevation[missing] = np.where(counts > 0, totals / norms, np.nan)
+    return pd.Series(elevation, index=df.index)
+
+
+# Interquartile GasProd filter, elevation fill and the final column names
+def clean_wells(df):
+    df = df[
+        (df['GasProd'] >= df['GasProd'].quantile(0.25)) &
+        (df['GasProd'] <= df['GasProd'].quantile(0.75))].copy()
+
+    df['Elevation'] = impute_elevation(df)
+
+    df = df.drop(columns=['API_WellNo', 'Year'])
+    return df.rename(columns=CLEAN_COLUMNS)[list(CLEAN_COLUMNS.values())]
+
+
+# Streams a file through sha256 without loading it whole
+def file_hash(path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+# Persisted ingest state: a per-file partial for every yearly file seen so far,
+# the per-well production totals and the filtered well attributes. A refresh
+# parses only yearly files that are new or whose content hash changed.
+class IngestState:
+    def __init__(self, state_dir=STATE_DIR):
+        self.state_dir = state_dir
+        self.manifest_path = os.path.join(state_dir, 'manifest.json')
+        self.totals_path = os.path.join(state_dir, 'totals.parquet')
+        self.wells_path = os.path.join(state_dir, 'wells.parquet')
+        os.makedirs(os.path.join(state_dir, 'partials'), exist_ok=True)
+
+        self.manifest = {'files': {}, 'wells': None}
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path) as f:
+                self.manifest = json.load(f)
+
+    def _partial_path(self, name):
+        return os.path.join(self.state_dir, 'partials', os.path.splitext(name)[0] + '.parquet')
+
+    # Size/mtime first, content hash only when those moved
+    def _fingerprint(self, path, known):
+        stat = os.stat(path)
+        if known and known['size'] == stat.st_size and known['mtime_ns'] == stat.st_mtime_ns:
+            return known
+        return {'hash': file_hash(path), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+    def _save_manifest(self):
+        tmp_path = self.manifest_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.manifest, f, indent=1)
+        os.replace(tmp_path, self.manifest_path)
+
+    # Fold new or changed yearly files into the per-well totals
+    def refresh_production(self, paths, workers=None):
+        known = self.manifest['files']
+        current = {os.path.basename(path): path for path in paths}
+        fingerprints = {name: self._fingerprint(path, known.get(name)) for name, path in current.items()}
+
+        added = [name for name in current if name not in known]
+        changed = [name for name in current if name in known and fingerprints[name]['hash'] != known[name]['hash']]
+        removed = [name for name in known if name not in current]
+
+        totals = pd.read_parquet(self.totals_path) if os.path.exists(self.totals_path) else None
+        stale = [self._partial_path(name) for name in changed + removed]
+        affected = (pd.concat([pd.read_parquet(path, columns=['API_WellNo']) for path in stale])['API_WellNo']
+                    if stale else pd.Series(dtype='int64'))
+
+        parsed = read_production_partials([current[name] for name in added + changed], workers=workers)
+        for name, partial in zip(added + changed, parsed):
+            partial.to_parquet(self._partial_path(name), index=False)
+        for name in removed:
+            os.remove(self._partial_path(name))
+
+        if totals is None or len(affected):
+            # A file changed or disappeared: rebuild the affected wells from the stored partials
+            partials = [pd.read_parquet(self._partial_path(name)) for name in current]
+            if totals is None:
+                totals = combine_partials(partials)
+            else:
+                affected = set(affected)
+                for partial in parsed:
+                    affected.update(partial['API_WellNo'])
+                rebuilt = combine_partials([p[p['API_WellNo'].isin(affected)] for p in partials])
+                totals = pd.concat([totals[~totals.index.isin(affected)], rebuilt]).sort_index()
+        elif parsed:
+            # Only new files: add their partials onto the existing totals
+            totals = combine_partials([totals.reset_index()] + parsed)
+
+        totals.to_parquet(self.totals_path)
+        self.manifest['files'] = fingerprints
+        self._save_manifest()
+        return totals, {'added': added, 'changed': changed, 'removed': removed}
+
+    # Filtered well attributes, re-read only when oilgas_wells.csv changes
+    def refresh_wells(self, wells_path):
+        fingerprint = self._fingerprint(wells_path, self.manifest.get('wells'))
+        cached = self.manifest.get('wells')
+        if cached and cached['hash'] == fingerprint['hash'] and os.path.exists(self.wells_path):
+            attributes = pd.read_parquet(self.wells_path)
+        else:
+            attributes = well_attributes(read_wells(wells_path))
+            attributes.to_parquet(self.wells_path)
+        self.manifest['wells'] = fingerprint
+        self._save_manifest()
+        return attributes
+
+
+# Full pipeline: filtered production + filtered wells -> per-well table -> clean_gaswells.csv.
+# With a state_dir only new or changed yearly files are parsed.
+def run_ingest(prod_dir=PROD_DIR, wells_path=WELLS_PATH, output_path=CLEAN_PATH, workers=None, state_dir=None):
+    paths = production_files(prod_dir)
+    if state_dir:
+        state = IngestState(state_dir)
+        totals, changes = state.refresh_production(paths, workers=workers)
+        attributes = state.refresh_wells(wells_path)
+        print(', '.join(f'{len(names)} {kind}' for kind, names in changes.items()), 'production files')
+    else:
+        totals = combine_partials(read_production_partials(paths, workers=workers))
+        attributes = well_attributes(read_wells(wells_path))
+
+    df = clean_wells(aggregate_wells(attributes, totals))
+
+    if output_path:
+        df.to_csv(output_path, index=False)
+    return df
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Build clean_gaswells.csv from the NYS well and production files.')
+    parser.add_argument('--prod-dir', default=PROD_DIR, help='directory holding the Prod<year>.csv files')
+    parser.add_argument('--wells', default=WELLS_PATH, help='oilgas_wells.csv well inventory')
+    parser.add_argument('--output', default=CLEAN_PATH, help='where to write the cleaned well table')
+    parser.add_argument('--workers', type=int, default=None, help='parallel readers (default: one per CPU)')
+    parser.add_argument('--incremental', action='store_true',
+                        help='keep per-file state and only parse new or changed yearly files')
+    parser.add_argument('--state-dir', default=STATE_DIR, help='where the incremental state is kept')
+    args = parser.parse_args(argv)
+
+    state_dir = args.state_dir if args.incremental else None
+    try:
+        df = run_ingest(args.prod_dir, args.wells, args.output, args.workers, state_dir)
+    except (FileNotFoundError, ValueError) as exc:
+        parser.error(str(exc))
+    print(f'{len(df)} wells written to {args.output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+import numpy as np
+from scipy.spatial import cKDTree
+from covariance import Covariance
+
+
+# Ordinary kriging over the k nearest wells of every target. The KD-tree is built
+# once; targets are grouped by their neighbour set, each distinct set's system
+# is factorized (inverted) once, and every target of the group reuses it. Follows
+# the skgstat OrdinaryKriging interface (transform, sigma), so it plugs into
+# grid_predict.predict_grid.
+class LocalKriging:
+    def __init__(self, coords, values, covariance, k=15, jitter=1e-8, chunk_size=10_000):
+        self.coords = np.asarray(coords, dtype=np.float64)
+        self.values = np.asarray(values, dtype=np.float64).ravel()
+        self.covariance = covariance
+        self.k = min(k, len(self.values))
+        self.jitter = jitter
+        self.chunk_size = chunk_size
+        self.tree = cKDTree(self.coords)
+        self.sigma = None
+
+    @classmethod
+    def from_variogram(cls, variogram, k=15, **kwargs):
+        return cls(variogram.coordinates, variogram.values, Covariance.from_variogram(variogram), k, **kwargs)
+
+    # Neighbour rows of every target, sorted so that equal sets compare equal,
+    # with the target-to-neighbour distances in the same order
+    def neighbours(self, targets):
+        distances, rows = self.tree.query(targets, k=self.k)
+        distances, rows = distances.reshape(len(targets), -1), rows.reshape(len(targets), -1)
+        order = np.argsort(rows, axis=1)
+        return np.take_along_axis(rows, order, axis=1), np.take_along_axis(distances, order, axis=1)
+
+    # Inverse of the covariance-form OK system [[C, 1], [1', 0]] of every neighbour set
+    def _system_inverses(self, neighbour_sets):
+        k = neighbour_sets.shape[1]
+        systems = np.ones((len(neighbour_sets), k + 1, k + 1))
+        # As ok_matrix: coincident wells keep the nugget off the diagonal
+        systems[:, :k, :k] = self.covariance.matrices(self.coords[neighbour_sets])
+        systems[:, np.arange(k), np.arange(k)] += self.jitter * self.covariance.total_sill
+        systems[:, k, k] = 0.0
+        return np.linalg.inv(systems)
+
+    def _predict_chunk(self, targets):
+        rows, distances = self.neighbours(targets)
+        neighbour_sets, group = np.unique(rows, axis=0, return_inverse=True)
+        group = group.ravel()
+        inverses = self._system_inverses(neighbour_sets)
+
+        # Right-hand side [c(target, neighbours); 1] and weights [w; mu] for every target
+        rhs = np.ones((len(targets), self.k + 1))
+        rhs[:, :self.k] = self.covariance(distances)
+        solution = np.einsum('tij,tj->ti', inverses[group], rhs)
+        weights, mu = solution[:, :self.k], solution[:, self.k]
+
+        field = (weights * self.values[rows]).sum(axis=1)
+        sigma = self.covariance.total_sill - (weights * rhs[:, :self.k]).sum(axis=1) - mu
+        return field, sigma
+
+    # Predictions at the (x, y) targets; the kriging variances are left in self.sigma
+    def transform(self, x, y):
+        targets = np.column_stack((np.ravel(x), np.ravel(y))).astype(np.float64)
+        field = np.empty(len(targets))
+        sigma = np.empty(len(targets))
+        for start in range(0, len(targets), self.chunk_size):
+            stop = start + self.chunk_size
+            field[start:stop], sigma[start:stop] = self._predict_chunk(targets[start:stop])
+        self.sigma = sigma
+        return field
@@ -0,0 +1,86 @@
+import argparse
+import numpy as np
+from scipy.linalg import lu_factor, lu_solve
+from covariance import Covariance, ok_matrix
+
+
+# Diagonal of the inverse of a factorized system, solving chunk_size unit
+# columns at a time (None solves them all at once)
+def inverse_diagonal(lu, n, chunk_size=None):
+    size = len(lu[0])
+    chunk_size = chunk_size or n
+    diagonal = np.empty(n)
+    for start in range(0, n, chunk_size):
+        stop = min(start + chunk_size, n)
+        columns = np.arange(start, stop)
+        unit = np.zeros((size, len(columns)))
+        unit[columns, np.arange(len(columns))] = 1.0
+        diagonal[start:stop] = lu_solve(lu, unit)[columns, np.arange(len(columns))]
+    return diagonal
+
+
+# Closed-form leave-one-out cross-validation of ordinary kriging with a global
+# neighbourhood (Dubrule, 1983). With A the kriging system and Q = inv(A), the
+# error of predicting well i from all the others is -(Q z)_i / Q_ii and its
+# kriging variance is 1 / Q_ii, so every well comes from one LU factorization.
+# Returns the errors (prediction - value, as in skgstat's jacknife) and variances.
+def loo_residuals(coords, values, covariance, chunk_size=None, jitter=1e-8):
+    coords = np.asarray(coords, dtype=np.float64)
+    values = np.asarray(values, dtype=np.float64).ravel()
+    n = len(values)
+
+    lu = lu_factor(ok_matrix(coords, covariance, jitter), check_finite=False)
+    weights = lu_solve(lu, np.append(values, 0.0))[:n]
+    q_diagonal = inverse_diagonal(lu, n, chunk_size)
+
+    errors = -weights / q_diagonal
+    variances = 1.0 / q_diagonal
+    return errors, variances
+
+
+def loo_scores(errors, variances):
+    standardized = errors / np.sqrt(variances)
+    return {
+        'rmse': float(np.sqrt(np.mean(errors ** 2))),
+        'mae': float(np.mean(np.abs(errors))),
+        'mean_standardized': float(np.mean(standardized)),
+        'rmse_standardized': float(np.sqrt(np.mean(standardized ** 2))),
+    }
+
+
+# RMSE/MAE and standardized error statistics of a fitted skgstat variogram,
+# plus the per-well errors and standardized errors
+def loocv(variogram, chunk_size=None, jitter=1e-8):
+    errors, variances = loo_residuals(variogram.coordinates, variogram.values,
+                                      Covariance.from_variogram(variogram), chunk_size, jitter)
+    scores = loo_scores(errors, variances)
+    scores['errors'] = errors
+    scores['standardized'] = errors / np.sqrt(variances)
+    return scores
+
+
+def main(argv=None):
+    from features import FEATURES_PATH
+    from tuning import load_samples, build_variogram
+
+    parser = argparse.ArgumentParser(description='Leave-one-out cross-validation of a variogram.')
+    parser.add_argument('--data', default=FEATURES_PATH)
+    parser.add_argument('--model', default='spherical')
+    parser.add_argument('--n-lags', type=int, default=10)
+    parser.add_argument('--azimuth', type=float, default=0)
+    parser.add_argument('--tolerance', type=float, default=45.0)
+    parser.add_argument('--bandwidth', default='q33')
+    parser.add_argument('--chunk-size', type=int, default=None)
+    args = parser.parse_args(argv)
+
+    coords, vals = load_samples(args.data)
+    variogram = build_variogram(coords, vals, {
+        'model': args.model, 'n_lags': args.n_lags, 'azimuth': args.azimuth,
+        'tolerance': args.tolerance, 'bandwidth': args.bandwidth})
+    scores = loocv(variogram, args.chunk_size)
+    for name in ['rmse', 'mae', 'mean_standardized', 'rmse_standardized']:
+        print(f'{name}: {scores[name]:.4f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,201 @@
+import os
+import shutil
+import hashlib
+import numpy as np
+from scipy.spatial.distance import pdist
+from skgstat import DirectionalVariogram
+
+CACHE_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'pair_cache'))
+PAIR_ARRAYS = ['distances', 'angles', 'first', 'second']
+
+
+# Key of a coordinate array: its shape and float64 bytes
+def coords_hash(coords):
+    coords = np.ascontiguousarray(coords, dtype=np.float64)
+    digest = hashlib.sha256(str(coords.shape).encode('utf-8'))
+    digest.update(coords.tobytes())
+    return digest.hexdigest()[:16]
+
+
+# Condensed (pdist order) Euclidean distances, angles to east in radians, and the
+# row indices of both points of every pair, for one set of coordinates. The arrays
+# are written once as .npy files and memory-mapped by every process that uses them.
+class PairCache:
+    def __init__(self, coords, cache_dir=CACHE_DIR):
+        self.coords = np.ascontiguousarray(coords, dtype=np.float64)
+        self.path = os.path.join(cache_dir, coords_hash(self.coords))
+        if not all(os.path.exists(self._array_path(self.path, name)) for name in PAIR_ARRAYS):
+            self._build(cache_dir)
+
+        for name in PAIR_ARRAYS:
+            setattr(self, name, np.load(self._array_path(self.path, name), mmap_mode='r'))
+        self._percentiles = {}
+
+    @staticmethod
+    def _array_path(path, name):
+        return os.path.join(path, f'{name}.npy')
+
+    def _build(self, cache_dir):
+        n = len(self.coords)
+        n_pairs = n * (n - 1) // 2
+
+        # Write into a private directory and rename it, so concurrent builders never see partial arrays
+        tmp_path = f'{self.path}.{os.getpid()}.tmp'
+        os.makedirs(tmp_path, exist_ok=True)
+        arrays = {
+            'distances': np.lib.format.open_memmap(self._array_path(tmp_path, 'distances'), 'w+', np.float64, (n_pairs,)),
+            'angles': np.lib.format.open_memmap(self._array_path(tmp_path, 'angles'), 'w+', np.float64, (n_pairs,)),
+            'first': np.lib.format.open_memmap(self._array_path(tmp_path, 'first'), 'w+', np.int32, (n_pairs,)),
+            'second': np.lib.format.open_memmap(self._array_path(tmp_path, 'second'), 'w+', np.int32, (n_pairs,)),
+        }
+
+        arrays['distances'][:] = pdist(self.coords, 'euclidean')
+
+        # Row by row to keep the temporaries small; pair (i, j) with i < j, as in pdist
+        start = 0
+        for i in range(n - 1):
+            stop = start + n - 1 - i
+            dx = self.coords[i, 0] - self.coords[i + 1:, 0]
+            dy = self.coords[i, 1] - self.coords[i + 1:, 1]
+            arrays['angles'][start:stop] = np.arctan2(dy, dx)
+            arrays['first'][start:stop] = i
+            arrays['second'][start:stop] = np.arange(i + 1, n)
+            start = stop
+
+        # Coincident points have no direction (skgstat yields NaN for them too)
+        arrays['angles'][arrays['distances'][:] == 0] = np.nan
+
+        for array in arrays.values():
+            array.flush()
+        del arrays
+
+        try:
+            os.replace(tmp_path, self.path)
+        except OSError:
+            # Another process finished first
+            shutil.rmtree(tmp_path, ignore_errors=True)
+
+    def __len__(self):
+        return len(self.distances)
+
+    # Distance percentile, as used for quantile bandwidths ('q33', 'q50', ...)
+    def percentile(self, q):
+        if q not in self._percentiles:
+            self._percentiles[q] = float(np.percentile(self.distances, q))
+        return self._percentiles[q]
+
+    def bandwidth(self, width):
+        return self.percentile(int(width[1:])) if isinstance(width, str) else width
+
+    # Absolute value difference of every pair
+    def value_diffs(self, values):
+        values = np.asarray(values, dtype=np.float64).ravel()
+        return np.abs(values[self.first] - values[self.second])
+
+    # Angular distance of every pair to the azimuth, folded to [0, pi/2]. Azimuth
+    # follows skgstat: degrees, measured clockwise from east.
+    def angular_offset(self, azimuth):
+        offset = np.abs(self.angles + np.radians(azimuth))
+        offset = np.where(offset > np.pi, offset - np.pi, offset)
+        return np.where(offset > np.pi / 2, np.pi - offset, offset)
+
+    # Pairs inside the directional search area of skgstat's 'triangle' and 'compass' models
+    def direction_mask(self, azimuth=0, tolerance=45.0, bandwidth='q33', directional_model='triangle'):
+        in_tol = self.angular_offset(azimuth) <= np.radians(tolerance / 2)
+        if directional_model == 'compass':
+            return in_tol
+        if directional_model != 'triangle':
+            raise ValueError(f'Unsupported directional model: {directional_model}')
+
+        across = np.abs(self.distances * np.sin(np.abs(self.angles + np.radians(azimuth))))
+        return in_tol & (self.bandwidth(bandwidth) / 2 >= across)
+
+    # Matheron experimental variogram for one direction as a single histogram over
+    # the cached pairs. Returns the upper bin edges, semivariances and pair counts,
+    # matching DirectionalVariogram(bin_func='even', estimator='matheron').
+    # subset (boolean, one per point) restricts the pairs to those with both points in it,
+    # so subsets of one coordinate set share the cache.
+    def experimental_variogram(self, values, n_lags=10, azimuth=0, tolerance=45.0, bandwidth='q33',
+                               directional_model='triangle', maxlag=None, subset=None):
+        mask = self.direction_mask(azimuth, tolerance, bandwidth, directional_model)
+        if subset is not None:
+            subset = np.asarray(subset, dtype=bool)
+            mask &= subset[self.first] & subset[self.second]
+        distances = self.distances[mask]
+        squared = self.value_diffs(values)[mask] ** 2
+
+        max_distance = distances.max() if len(distances) else 0.0
+        if maxlag is None or maxlag > max_distance:
+            maxlag = max_distance
+        bins = np.linspace(0, maxlag, n_lags + 1)[1:]
+
+        groups = np.digitize(distances, bins)
+        inside = groups < n_lags
+        counts = np.bincount(groups[inside], minlength=n_lags)
+        sums = np.bincount(groups[inside], weights=squared[inside], minlength=n_lags)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            gamma = np.where(counts > 0, sums / (2 * counts), np.nan)
+        return bins, gamma, counts
+
+    # Experimental variograms for many azimuths in one pass over the pairs: every pair
+    # is binned once into (angle sector, lag) cells, and each azimuth sums the
+    # sectors within its tolerance. Uses the unbounded 'compass' search area;
+    # sector_width (degrees) sets the angular resolution. Returns the upper bin
+    # edges and (n_azimuths, n_lags) semivariance and count arrays.
+    def azimuth_scan(self, values, azimuths=range(0, 180, 15), tolerance=45.0, n_lags=10,
+                     maxlag=None, sector_width=1.0):
+        if maxlag is None:
+            maxlag = self.distances.max()
+        bins = np.linspace(0, maxlag, n_lags + 1)[1:]
+        n_sectors = int(round(180 / sector_width))
+
+        # Axial direction of every pair folded to [0, 180) degrees
+        direction = np.degrees(self.angles) % 180
+        valid = ~np.isnan(direction)
+        groups = np.digitize(self.distances[valid], bins)
+        inside = groups < n_lags
+        sectors = np.minimum((direction[valid][inside] / sector_width).astype(np.int64), n_sectors - 1)
+        cells = sectors * n_lags + groups[inside]
+
+        squared = self.value_diffs(values)[valid][inside] ** 2
+        counts = np.bincount(cells, minlength=n_sectors * n_lags).reshape(n_sectors, n_lags)
+        sums = np.bincount(cells, weights=squared, minlength=n_sectors * n_lags).reshape(n_sectors, n_lags)
+
+        # An azimuth selects pairs whose direction is within tolerance / 2 of -azimuth
+        centers = (np.arange(n_sectors) + 0.5) * sector_width
+        gammas, pair_counts = [], []
+        for azimuth in azimuths:
+            offset = np.abs((centers + azimuth) % 180)
+            offset = np.minimum(offset, 180 - offset)
+            selected = offset <= tolerance / 2
+            count = counts[selected].sum(axis=0)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                gammas.append(np.where(count > 0, sums[selected].sum(axis=0) / (2 * count), np.nan))
+            pair_counts.append(count)
+        return bins, np.array(gammas), np.array(pair_counts)
+
+
+# DirectionalVariogram that takes its distances, angles, value differences and
+# quantile bandwidths from a PairCache instead of recomputing them per instance
+class CachedDirectionalVariogram(DirectionalVariogram):
+    def __init__(self, pair_cache, coordinates=None, values=None, **kwargs):
+        self.pair_cache = pair_cache
+        coordinates = pair_cache.coords if coordinates is None else coordinates
+        super().__init__(coordinates, values, **kwargs)
+
+    @property
+    def distance(self):
+        return self.pair_cache.distances
+
+    @DirectionalVariogram.bandwidth.setter
+    def bandwidth(self, width):
+        DirectionalVariogram.bandwidth.fset(self, self.pair_cache.bandwidth(width))
+
+    def _calc_direction_mask_data(self, force=False):
+        if self._angles is not None and not force:
+            return
+        self._angles = self.pair_cache.angles
+        self._euclidean_dist = self.pair_cache.distances
+
+    def _format_values_stack(self, values):
+        return self.pair_cache.value_diffs(values)
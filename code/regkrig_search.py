@@ -0,0 +1,153 @@
+import time
+import warnings
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from sklearn.base import clone
+from sklearn.svm import SVR
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.linear_model import LinearRegression
+from sklearn.metrics import r2_score
+from sklearn.model_selection import train_test_split, ParameterSampler, ParameterGrid
+from pykrige.rk import Krige
+from features import FEATURES_PATH, load_features, split_features
+
+# Residual-kriging search space of the regression kriging tuning in model_development.ipynb
+KRIGE_DIST = {
+    'variogram_model': ['linear', 'power', 'spherical', 'gaussian'],
+    'n_closest_points': [5, 10, 20],
+    'nlags': [6, 10, 14],
+    'anisotropy_scaling': [(1.0, 1.0), (1.1, 1.0), (1.2, 1.0)],
+    'anisotropy_angle': [(0.0, 0.0, 0.0), (15.0, 0.0, 0.0), (30.0, 0.0, 0.0)]}
+
+KRIGE_PARAMS = ['variogram_model', 'n_closest_points', 'nlags', 'anisotropy_scaling', 'anisotropy_angle']
+
+# Set once per worker process by _init_worker
+_x_train = None
+_x_test = None
+_target_test = None
+_regressions = None
+
+
+# Train/test split of the encoded well features, as in model_development.ipynb:
+# predictors p (CSR), coordinates x and target
+def load_split(path=FEATURES_PATH, test_size=0.3, random_state=42):
+    p, x, target, _ = split_features(*load_features(path))
+    return train_test_split(p, x, target, test_size=test_size, random_state=random_state)
+
+
+def default_regressions():
+    return {'SVR': SVR(), 'RandomForestRegressor': RandomForestRegressor(), 'LinearRegression': LinearRegression()}
+
+
+# Fit every regression model once on the training predictors and keep its training
+# residuals and test predictions; residual kriging candidates only need those.
+def fit_regressions(regressions, p_train, target_train, p_test):
+    fitted = {}
+    for name, model in regressions.items():
+        start = time.perf_counter()
+        model = clone(model).fit(p_train, target_train)
+        fitted[name] = {
+            'model': model,
+            'residuals': target_train - model.predict(p_train),
+            'test_prediction': model.predict(p_test),
+            'seconds': round(time.perf_counter() - start, 3),
+        }
+    return fitted
+
+
+def _init_worker(x_train, x_test, target_test, regressions):
+    global _x_train, _x_test, _target_test, _regressions
+    _x_train, _x_test, _target_test = x_train, x_test, target_test
+    _regressions = regressions
+    warnings.filterwarnings('ignore')
+
+
+# Krige the cached residuals of one regression model with one set of Krige
+# settings and score regression + kriged residual on the test wells (R^2, as
+# RegressionKriging.score)
+def _score_candidate(params):
+    start = time.perf_counter()
+    regression = _regressions[params['regression_model']]
+    try:
+        krige = Krige(method='ordinary', **{key: params[key] for key in KRIGE_PARAMS if key in params})
+        krige.fit(x=_x_train, y=regression['residuals'])
+        prediction = krige.predict(_x_test) + regression['test_prediction']
+        score, error = float(r2_score(_target_test, prediction)), None
+    except Exception as exc:
+        score, error = -np.inf, f'{type(exc).__name__}: {exc}'
+    return {'params': params, 'score': score, 'error': error,
+            'seconds': round(time.perf_counter() - start, 3)}
+
+
+# Score regression kriging candidates in parallel. Candidates name their
+# regression model (a key of fitted); the regressions are not refitted.
+# Returns (best_params, best_score, results).
+def search(candidates, fitted, x_train, x_test, target_test, workers=None):
+    regressions = {name: {key: entry[key] for key in ('residuals', 'test_prediction')}
+                   for name, entry in fitted.items()}
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(x_train, x_test, target_test, regressions)) as executor:
+        results = list(executor.map(_score_candidate, candidates))
+
+    best = max(results, key=lambda result: result['score'])
+    return best['params'], best['score'], results
+
+
+# Grid around the best random-search candidate, as refined in model_development.ipynb
+def refine_grid(best_params):
+    param_grid = {
+        'regression_model': [best_params['regression_model']],
+        'variogram_model': [best_params['variogram_model']],
+        'n_closest_points': [best_params['n_closest_points'] - 1,
+                             best_params['n_closest_points'],
+                             best_params['n_closest_points'] + 1],
+        'nlags': [best_params['nlags'] - 2,
+                  best_params['nlags'],
+                  best_params['nlags'] + 2],
+        'anisotropy_scaling': [(1.0, 1.0),
+                               tuple(best_params['anisotropy_scaling']),
+                               (best_params['anisotropy_scaling'][0] * 1.05, best_params['anisotropy_scaling'][1])],
+        'anisotropy_angle': [(0.0, 0.0, 0.0),
+                             tuple(best_params['anisotropy_angle']),
+                             (best_params['anisotropy_angle'][0] + 5, 0.0, 0.0)]}
+    return list(ParameterGrid(param_grid))
+
+
+# Random search followed by the refined grid around its winner. The regressions
+# are fitted once up front and shared by both stages.
+def tune(p_train, p_test, x_train, x_test, target_train, target_test, regressions=None,
+         n_iter=10, random_state=42, workers=None):
+    fitted = fit_regressions(regressions or default_regressions(), p_train, target_train, p_test)
+
+    param_dist = dict(KRIGE_DIST, regression_model=list(fitted))
+    random_params = list(ParameterSampler(param_dist, n_iter=n_iter, random_state=random_state))
+    best_params, best_score, _ = search(random_params, fitted, x_train, x_test, target_test, workers)
+    print('RandomizedSearch')
+    print(best_params)
+    print(best_score)
+
+    grid_params, grid_score, _ = search(refine_grid(best_params), fitted, x_train, x_test, target_test, workers)
+    if grid_score > best_score:
+        best_params, best_score = grid_params, grid_score
+    print('Regression Kriging')
+    print(best_score)
+    print(best_params)
+    return best_params, best_score, fitted[best_params['regression_model']]['model']
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Tune regression kriging with cached regressions.')
+    parser.add_argument('--data', default=FEATURES_PATH)
+    parser.add_argument('--n-iter', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args(argv)
+
+    p_train, p_test, x_train, x_test, target_train, target_test = load_split(args.data)
+    tune(p_train, p_test, x_train, x_test, target_train, target_test,
+         n_iter=args.n_iter, random_state=args.seed, workers=args.workers)
+
+
+if __name__ == '__main__':
+    main()
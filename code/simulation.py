@@ -0,0 +1,254 @@
+import os
+import json
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+import dill as pickle
+from scipy import stats
+from scipy.spatial import cKDTree
+from scipy.spatial.distance import cdist
+from covariance import Covariance
+from grid_predict import grid_axes, sample_bounds
+from artifact import load_artifact
+
+SIMULATION_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'simulation'))
+QUANTILES = {'p10': 0.10, 'p50': 0.50, 'p90': 0.90}
+
+# Set once per worker process by _init_worker
+_engine = None
+_output_dir = None
+
+
+# Normal scores of values and the (scores, values) table that maps them back
+def normal_scores(values):
+    values = np.asarray(values, dtype=np.float64).ravel()
+    scores = stats.norm.ppf((stats.rankdata(values) - 0.5) / len(values))
+    order = np.argsort(values)
+    return scores, (scores[order], values[order])
+
+
+# Covariance with the same model shape scaled to a total sill of 1, the covariance
+# of the normal scores the simulation works on
+def standardized(covariance):
+    total = covariance.total_sill
+    return Covariance(lambda h: covariance.gamma(h) / total, covariance.sill / total, covariance.nugget / total)
+
+
+# Sequential Gaussian simulation over the x by y grid, conditioned on the wells.
+# Works on normal scores with the variogram's model at unit sill: every node along
+# a random path gets a simple kriging estimate from its k_data nearest wells and its
+# k_sim nearest already simulated nodes, plus a normal draw with the kriging variance.
+# Well neighbours do not change between realizations and are found once with a
+# KD-tree; simulated neighbours come from a distance-sorted template of grid offsets
+# within search_radius (default the variogram range). Realizations are
+# back-transformed through the normal-score table and the trend, if any, is re-added.
+class SequentialGaussianSimulation:
+    def __init__(self, coords, values, covariance, x, y, k_data=12, k_sim=12,
+                 search_radius=None, max_offsets=4_000, trend=None, jitter=1e-8):
+        self.coords = np.asarray(coords, dtype=np.float64)
+        self.scores, self.table = normal_scores(values)
+        # Well values in the units of the realizations, for default thresholds
+        self.well_values = np.asarray(values, dtype=np.float64).ravel()
+        if trend is not None:
+            self.well_values = self.well_values + trend.evaluate(self.coords[:, 0], self.coords[:, 1])
+        self.covariance = standardized(covariance)
+        self.x, self.y = np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64)
+        self.shape = (len(self.x), len(self.y))
+        self.k_sim = k_sim
+        self.trend = trend
+        self.jitter = jitter
+
+        xx, yy = np.meshgrid(self.x, self.y, indexing='ij')
+        self.nodes = np.column_stack((xx.ravel(), yy.ravel()))
+        _, rows = cKDTree(self.coords).query(self.nodes, k=min(k_data, len(self.coords)))
+        self.data_rows = rows.reshape(len(self.nodes), -1)
+
+        if search_radius is None:
+            search_radius = covariance.parameters['cof'][0] if covariance.parameters else np.inf
+        self._build_template(search_radius, max_offsets)
+
+    @classmethod
+    def from_variogram(cls, variogram, x, y, **kwargs):
+        return cls(variogram.coordinates, variogram.values, Covariance.from_variogram(variogram), x, y, **kwargs)
+
+    # Wells and variogram of a saved kriging artifact (see artifact.py)
+    @classmethod
+    def from_artifact(cls, path, x, y, **kwargs):
+        model = load_artifact(path)
+        return cls(np.array(model.coords), np.array(model.values), model.covariance, x, y, **kwargs)
+
+    # Grid offsets within radius, nearest first, as flat offsets into the padded grid
+    def _build_template(self, radius, max_offsets):
+        dx = abs(self.x[1] - self.x[0]) if len(self.x) > 1 else np.inf
+        dy = abs(self.y[1] - self.y[0]) if len(self.y) > 1 else np.inf
+        reach_x = int(min(np.ceil(radius / dx), self.shape[0] - 1))
+        reach_y = int(min(np.ceil(radius / dy), self.shape[1] - 1))
+        di, dj = np.meshgrid(np.arange(-reach_x, reach_x + 1), np.arange(-reach_y, reach_y + 1), indexing='ij')
+        distance = np.hypot(di * dx if reach_x else 0, dj * dy if reach_y else 0).ravel()
+        keep = (distance > 0) & (distance <= radius)
+        order = np.argsort(distance[keep], kind='stable')[:max_offsets]
+
+        self.pad = (reach_x, reach_y)
+        self.padded_shape = (self.shape[0] + 2 * reach_x, self.shape[1] + 2 * reach_y)
+        self.offsets = (di.ravel()[keep][order] * self.padded_shape[1] + dj.ravel()[keep][order])
+
+    # One realization in normal-score space, (nx, ny)
+    def simulate_scores(self, seed):
+        rng = np.random.default_rng(seed)
+        path = rng.permutation(len(self.nodes))
+        noise = rng.standard_normal(len(self.nodes))
+
+        # Simulated values and their grid positions live in a padded grid so the
+        # template never leaves the array
+        simulated = np.full(self.padded_shape, np.nan).ravel()
+        ny = self.shape[1]
+        pad_x, pad_y = self.pad
+        for node, draw in zip(path, noise):
+            i, j = divmod(node, ny)
+            position = (i + pad_x) * self.padded_shape[1] + (j + pad_y)
+            around = position + self.offsets
+            found = around[~np.isnan(simulated[around])][:self.k_sim]
+
+            rows = self.data_rows[node]
+            found_i = found // self.padded_shape[1] - pad_x
+            found_j = found % self.padded_shape[1] - pad_y
+            points = np.concatenate((self.coords[rows],
+                                     np.column_stack((self.x[found_i], self.y[found_j]))))
+            values = np.concatenate((self.scores[rows], simulated[found]))
+
+            # Simple kriging with mean 0 and unit sill
+            system = self.covariance.matrix(points)
+            system[np.diag_indices_from(system)] += self.jitter
+            rhs = self.covariance(cdist(self.nodes[node:node + 1], points)[0])
+            weights = np.linalg.solve(system, rhs)
+            variance = max(1.0 - weights @ rhs, 0.0)
+            simulated[position] = weights @ values + np.sqrt(variance) * draw
+
+        simulated = simulated.reshape(self.padded_shape)
+        return simulated[pad_x:pad_x + self.shape[0], pad_y:pad_y + ny]
+
+    # One realization in data units (trend re-added), (nx, ny)
+    def realization(self, seed):
+        field = np.interp(self.simulate_scores(seed), *self.table)
+        if self.trend is not None:
+            field = field + self.trend.evaluate(self.nodes[:, 0], self.nodes[:, 1]).reshape(self.shape)
+        return field
+
+
+def _array_path(output_dir, name):
+    return os.path.join(output_dir, f'{name}.npy')
+
+
+# Seed of one realization; the same whatever worker or order it runs in
+def realization_seed(seed, realization):
+    return [seed, realization]
+
+
+def _init_worker(engine_bytes, output_dir):
+    global _engine, _output_dir
+    _engine = pickle.loads(engine_bytes)
+    _output_dir = output_dir
+
+
+# Simulate one realization and write it straight into realizations.npy
+def _simulate(task):
+    realization, seed = task
+    start = time.perf_counter()
+    field = _engine.realization(realization_seed(seed, realization))
+    realizations = np.load(_array_path(_output_dir, 'realizations'), mmap_mode='r+')
+    realizations[realization] = field
+    realizations.flush()
+    del realizations
+    return realization, round(time.perf_counter() - start, 3)
+
+
+# Run n_realizations of the engine across a process pool. Realizations stream into
+# output_dir/realizations.npy (n_realizations, nx, ny) as they finish; the mean and
+# the probability of exceeding each threshold are accumulated one realization at a
+# time, and the P10/P50/P90 grids (10th/50th/90th percentiles) are then computed
+# from the file in blocks of about chunk_cells values, so no more than one
+# realization or one block is ever in memory. Returns load_summary(output_dir).
+def simulate_grid(engine, n_realizations=100, thresholds=None, output_dir=SIMULATION_DIR, seed=42,
+                  workers=None, chunk_cells=5_000_000, dtype=np.float32):
+    if thresholds is None:
+        thresholds = [float(np.median(engine.well_values))]
+    thresholds = np.atleast_1d(np.asarray(thresholds, dtype=np.float64))
+    os.makedirs(output_dir, exist_ok=True)
+    realizations = np.lib.format.open_memmap(_array_path(output_dir, 'realizations'), 'w+', dtype,
+                                             (n_realizations,) + engine.shape)
+    del realizations
+
+    total = np.zeros(engine.shape)
+    exceedance = np.zeros((len(thresholds),) + engine.shape)
+    seconds = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(pickle.dumps(engine), output_dir)) as executor:
+        futures = [executor.submit(_simulate, (realization, seed)) for realization in range(n_realizations)]
+        realizations = np.load(_array_path(output_dir, 'realizations'), mmap_mode='r')
+        for future in as_completed(futures):
+            realization, elapsed = future.result()
+            field = np.asarray(realizations[realization], dtype=np.float64)
+            total += field
+            exceedance += field[None] > thresholds[:, None, None]
+            seconds.append(elapsed)
+
+    np.save(_array_path(output_dir, 'mean'), (total / n_realizations).astype(dtype))
+    np.save(_array_path(output_dir, 'exceedance'), (exceedance / n_realizations).astype(dtype))
+
+    quantiles = {name: np.lib.format.open_memmap(_array_path(output_dir, name), 'w+', dtype, engine.shape)
+                 for name in QUANTILES}
+    rows = max(1, chunk_cells // (n_realizations * engine.shape[1]))
+    for start in range(0, engine.shape[0], rows):
+        block = np.asarray(realizations[:, start:start + rows], dtype=np.float64)
+        for name, value in zip(QUANTILES, np.quantile(block, list(QUANTILES.values()), axis=0)):
+            quantiles[name][start:start + rows] = value
+    for array in quantiles.values():
+        array.flush()
+    del quantiles, realizations
+
+    with open(os.path.join(output_dir, 'summary.json'), 'w') as file:
+        json.dump({'n_realizations': n_realizations, 'seed': seed, 'thresholds': thresholds.tolist(),
+                   'x': [float(engine.x[0]), float(engine.x[-1]), len(engine.x)],
+                   'y': [float(engine.y[0]), float(engine.y[-1]), len(engine.y)],
+                   'seconds_per_realization': round(float(np.mean(seconds)), 3)}, file, indent=2)
+    return load_summary(output_dir)
+
+
+# Summary grids of a simulation run, memory-mapped: mean, p10, p50, p90 (nx, ny),
+# exceedance (n_thresholds, nx, ny) and the summary.json metadata
+def load_summary(output_dir=SIMULATION_DIR):
+    with open(os.path.join(output_dir, 'summary.json')) as file:
+        summary = json.load(file)
+    for name in ['mean', 'exceedance'] + list(QUANTILES):
+        summary[name] = np.load(_array_path(output_dir, name), mmap_mode='r')
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Sequential Gaussian simulation over the prediction grid.')
+    parser.add_argument('model', help='kriging artifact directory, e.g. ../model/tuned_ordinary')
+    parser.add_argument('--trend', default=None, help='trend.json to re-add to the realizations')
+    parser.add_argument('--realizations', type=int, default=100)
+    parser.add_argument('--threshold', type=float, nargs='+', default=None,
+                        help='exceedance thresholds (default: median of the wells)')
+    parser.add_argument('--shape', type=int, nargs=2, default=(100, 100), metavar=('NX', 'NY'))
+    parser.add_argument('--k-data', type=int, default=12)
+    parser.add_argument('--k-sim', type=int, default=12)
+    parser.add_argument('--output', default=SIMULATION_DIR)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args(argv)
+
+    from trend import TrendModel
+    x, y = grid_axes(sample_bounds(load_artifact(args.model).coords), args.shape)
+    trend = TrendModel.load(args.trend) if args.trend else None
+    engine = SequentialGaussianSimulation.from_artifact(args.model, x, y, k_data=args.k_data,
+                                                        k_sim=args.k_sim, trend=trend)
+    summary = simulate_grid(engine, args.realizations, args.threshold, args.output, args.seed, args.workers)
+    print(f'{args.output}: {summary["n_realizations"]} realizations, '
+          f'{summary["seconds_per_realization"]} s each')
+
+
+if __name__ == '__main__':
+    main()
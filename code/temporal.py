@@ -0,0 +1,227 @@
+import os
+import json
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from scipy.optimize import curve_fit
+from covariance import Covariance, VARIOGRAM_MODELS
+from local_kriging import LocalKriging
+from pair_cache import PairCache, CACHE_DIR
+from grid_predict import grid_axes, sample_bounds
+from trend import TrendModel
+from ingest import (PROD_DIR, WELLS_PATH, production_files, read_production_partials, combine_partials,
+                    read_wells, well_attributes, aggregate_wells)
+
+# Output resolved from this file, like ingest.DATA_DIR, so the dashboard finds the frames
+# whatever directory the CLI runs from
+TEMPORAL_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'temporal'))
+# Models fitted as [range, sill] with no nugget, skgstat's default
+TEMPORAL_MODELS = ['spherical', 'exponential', 'gaussian', 'cubic']
+
+# Set once per worker process by _init_worker
+_x = None
+_y = None
+_output_dir = None
+
+
+# Per-well production partials of every yearly file, keyed by year (parsed in parallel)
+def yearly_partials(prod_dir=PROD_DIR, workers=None):
+    partials = read_production_partials(production_files(prod_dir), workers=workers)
+    return {int(partial['Year'].max()): partial for partial in partials if len(partial)}
+
+
+# (label, years) of every period: each year alone, or rolling windows of `window`
+# years ending at each year
+def production_periods(years, window=1):
+    if window < 1:
+        raise ValueError(f'window must be at least 1 year, got {window}')
+    years = sorted(years)
+    periods = []
+    for end in range(window - 1, len(years)):
+        span = years[end - window + 1:end + 1]
+        periods.append((str(span[0]) if window == 1 else f'{span[0]}-{span[-1]}', span))
+    return periods
+
+
+# Wells of one period: GasProd summed over its years, joined to the well attributes
+# and cut to the interquartile range as in ingest.clean_wells (API_WellNo is kept)
+def period_wells(partials, years, attributes):
+    df = aggregate_wells(attributes, combine_partials([partials[year] for year in years]))
+    df = df[(df['GasProd'] >= df['GasProd'].quantile(0.25)) & (df['GasProd'] <= df['GasProd'].quantile(0.75))]
+    return df[['API_WellNo', 'Bottom_hole_longitude', 'Bottom_hole_latitude', 'GasProd']]
+
+
+# Every well of any period, one row each. One PairCache over these coordinates
+# serves the experimental variograms of all periods, each as a subset of the pairs.
+class PeriodWellIndex:
+    def __init__(self, samples, cache_dir=CACHE_DIR):
+        api = np.concatenate([sample['api'] for sample in samples]).astype(np.int64)
+        coords = np.concatenate([sample['coords'] for sample in samples])
+        self.api, first = np.unique(api, return_index=True)
+        self.coords = coords[first]
+        self.pair_cache = PairCache(self.coords, cache_dir)
+
+    def rows(self, api):
+        return np.searchsorted(self.api, np.asarray(api, dtype=np.int64))
+
+    # Subset mask and full-length values (NaN outside the subset) of one period
+    def subset(self, api, values):
+        rows = self.rows(api)
+        mask = np.zeros(len(self.api), dtype=bool)
+        mask[rows] = True
+        full = np.full(len(self.api), np.nan)
+        full[rows] = values
+        return mask, full
+
+
+# Least-squares fit of a [range, sill] model to one experimental variogram, bounded
+# like skgstat's 'trf' fit. p0 (e.g. the previous period's fit) starts the search;
+# without it the search starts from the bounds. Returns the coefficients and the
+# number of function evaluations.
+def fit_model(bins, gamma, model='spherical', p0=None):
+    if model not in TEMPORAL_MODELS:
+        raise ValueError(f'model must be one of {TEMPORAL_MODELS}, got {model!r}')
+    function = VARIOGRAM_MODELS[model]
+    valid = np.isfinite(gamma)
+    upper = np.array([bins[-1], np.nanmax(gamma)])
+    start = upper if p0 is None else np.clip(p0, upper * 1e-6, upper)
+    cof, _, info, _, _ = curve_fit(lambda h, r, c0: function(h, r, c0), bins[valid], gamma[valid],
+                                   p0=start, bounds=(0, upper), method='trf', full_output=True)
+    return [float(value) for value in cof], int(info['nfev'])
+
+
+# Variograms of every period fitted in order, each warm-started from the fit of the
+# period before. samples hold every period's label, API_WellNo and detrended residuals.
+def fit_periods(index, samples, model='spherical', n_lags=10, azimuth=0, tolerance=180.0,
+                bandwidth='q33', directional_model='compass', maxlag=None):
+    fits, p0 = [], None
+    for sample in samples:
+        subset, values = index.subset(sample['api'], sample['residuals'])
+        bins, gamma, counts = index.pair_cache.experimental_variogram(
+            values, n_lags, azimuth, tolerance, bandwidth, directional_model, maxlag, subset=subset)
+        cof, nfev = fit_model(bins, gamma, model, p0)
+        fits.append({'label': sample['label'], 'model': model, 'cof': cof, 'nfev': nfev,
+                     'bins': bins.tolist(), 'gamma': gamma.tolist(), 'counts': counts.tolist()})
+        p0 = cof
+    return fits
+
+
+def _array_path(output_dir, name):
+    return os.path.join(output_dir, f'{name}.npy')
+
+
+def _init_worker(x, y, output_dir):
+    global _x, _y, _output_dir
+    _x, _y = x, y
+    _output_dir = output_dir
+
+
+# Krige one period's residuals over the grid, re-add its trend and write the frame
+# straight into field.npy / sigma.npy
+def _krige_period(task):
+    frame, coords, residuals, model, cof, trend, k = task
+    covariance = Covariance.from_parameters(model, cof, sill=cof[1])
+    xx, yy = np.meshgrid(_x, _y, indexing='ij')
+    kriging = LocalKriging(coords, residuals, covariance, k=k)
+    field = kriging.transform(xx, yy).reshape(xx.shape) + trend.evaluate(xx, yy)
+
+    for name, values in (('field', field), ('sigma', kriging.sigma.reshape(xx.shape))):
+        frames = np.load(_array_path(_output_dir, name), mmap_mode='r+')
+        frames[frame] = values
+        frames.flush()
+        del frames
+    return frame
+
+
+# One kriged surface per production period over a shared x by y grid. Each period
+# gets its own trend surface and a variogram fitted to its detrended wells, warm-
+# started from the period before; the kriging of the periods then runs across a
+# process pool. Frames stream into output_dir/field.npy and sigma.npy
+# (n_periods, nx, ny), and periods.json records every period's years, wells,
+# trend and variogram. Periods with fewer than min_wells wells are skipped.
+# Returns load_frames(output_dir).
+def krige_periods(partials, attributes, window=1, model='spherical', x=None, y=None, shape=(100, 100),
+                  k=15, min_wells=30, output_dir=TEMPORAL_DIR, workers=None, cache_dir=CACHE_DIR,
+                  dtype=np.float32, **variogram_params):
+    samples = []
+    for label, years in production_periods(partials, window):
+        wells = period_wells(partials, years, attributes)
+        if len(wells) < min_wells:
+            continue
+        coords = wells[['Bottom_hole_longitude', 'Bottom_hole_latitude']].values.astype(np.float64)
+        trend = TrendModel.fit(coords[:, 0], coords[:, 1], wells['GasProd'].values)
+        samples.append({'label': label, 'years': [int(year) for year in years],
+                        'api': wells['API_WellNo'].values, 'coords': coords, 'trend': trend,
+                        'residuals': wells['GasProd'].values - trend.evaluate(coords[:, 0], coords[:, 1])})
+
+    if not samples:
+        raise ValueError(f'no production period has {min_wells} or more wells to krige '
+                         f'({len(partials)} years, window {window})')
+
+    index = PeriodWellIndex(samples, cache_dir)
+    fits = fit_periods(index, samples, model, **variogram_params)
+    if x is None or y is None:
+        x, y = grid_axes(sample_bounds(index.coords), shape)
+
+    os.makedirs(output_dir, exist_ok=True)
+    for name in ('field', 'sigma'):
+        frames = np.lib.format.open_memmap(_array_path(output_dir, name), 'w+', dtype, (len(samples), len(x), len(y)))
+        del frames
+
+    tasks = [(frame, sample['coords'], sample['residuals'], model, fit['cof'], sample['trend'], k)
+             for frame, (sample, fit) in enumerate(zip(samples, fits))]
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(np.asarray(x), np.asarray(y), output_dir)) as executor:
+        list(executor.map(_krige_period, tasks))
+
+    field = np.load(_array_path(output_dir, 'field'), mmap_mode='r')
+    periods = []
+    for frame, (sample, fit) in enumerate(zip(samples, fits)):
+        trend = sample['trend']
+        periods.append(dict(fit, years=sample['years'], wells=len(sample['api']),
+                            trend={'powers': trend.powers.tolist(), 'coefficients': trend.coefficients.tolist(),
+                                   'intercept': trend.intercept},
+                            min=float(np.nanmin(field[frame])), max=float(np.nanmax(field[frame]))))
+    del field
+    with open(os.path.join(output_dir, 'periods.json'), 'w') as file:
+        json.dump({'window': window, 'k': k,
+                   'x': [float(x[0]), float(x[-1]), len(x)], 'y': [float(y[0]), float(y[-1]), len(y)],
+                   'periods': periods}, file, indent=2)
+    return load_frames(output_dir)
+
+
+# Frames of a krige_periods run, memory-mapped: field and sigma (n_periods, nx, ny)
+# and the periods.json metadata
+def load_frames(output_dir=TEMPORAL_DIR):
+    with open(os.path.join(output_dir, 'periods.json')) as file:
+        summary = json.load(file)
+    for name in ('field', 'sigma'):
+        summary[name] = np.load(_array_path(output_dir, name), mmap_mode='r')
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Krige gas production per year or rolling window of years.')
+    parser.add_argument('--prod-dir', default=PROD_DIR, help='directory holding the Prod<year>.csv files')
+    parser.add_argument('--wells', default=WELLS_PATH, help='oilgas_wells.csv well inventory')
+    parser.add_argument('--window', type=int, default=1, help='years per period (rolling)')
+    parser.add_argument('--model', choices=TEMPORAL_MODELS, default='spherical')
+    parser.add_argument('--shape', type=int, nargs=2, default=(100, 100), metavar=('NX', 'NY'))
+    parser.add_argument('--k', type=int, default=15, help='neighbouring wells per kriging target')
+    parser.add_argument('--output', default=TEMPORAL_DIR)
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args(argv)
+    if args.window < 1:
+        parser.error(f'--window must be at least 1, got {args.window}')
+
+    partials = yearly_partials(args.prod_dir, args.workers)
+    attributes = well_attributes(read_wells(args.wells))
+    summary = krige_periods(partials, attributes, args.window, args.model, shape=args.shape, k=args.k,
+                            output_dir=args.output, workers=args.workers)
+    for period in summary['periods']:
+        print(f'{period["label"]}: {period["wells"]} wells, range {period["cof"][0]:.4f}, '
+              f'sill {period["cof"][1]:.4g} ({period["nfev"]} evaluations)')
+
+
+if __name__ == '__main__':
+    main()
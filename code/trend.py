@@ -0,0 +1,64 @@
+import os
+import json
+import numpy as np
+from sklearn.linear_model import LinearRegression
+from sklearn.preprocessing import PolynomialFeatures
+
+TREND_PATH = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'model', 'trend.json'))
+
+
+# Polynomial trend surface gas_prod ~ poly(longitude, latitude), stored as the
+# monomial powers and regression coefficients so any grid can be re-trended
+# without sklearn objects, CSVs or refitting.
+class TrendModel:
+    def __init__(self, powers, coefficients, intercept):
+        self.powers = np.asarray(powers, dtype=np.int64)
+        self.coefficients = np.asarray(coefficients, dtype=np.float64)
+        self.intercept = float(intercept)
+
+    @classmethod
+    def from_regression(cls, poly, reg):
+        return cls(poly.powers_, reg.coef_, reg.intercept_)
+
+    # PolynomialFeatures(degree) + LinearRegression, as in model_development.ipynb
+    @classmethod
+    def fit(cls, lon, lat, target, degree=3):
+        coordinates = np.column_stack((np.ravel(lon), np.ravel(lat)))
+        poly = PolynomialFeatures(degree=degree, include_bias=False)
+        reg = LinearRegression().fit(poly.fit_transform(coordinates), np.ravel(target))
+        return cls.from_regression(poly, reg)
+
+    # Columns values ** 0 ... values ** degree by repeated multiplication
+    def _powers(self, values):
+        powers = np.empty((len(values), self.powers.max() + 1))
+        powers[:, 0] = 1.0
+        for degree in range(1, powers.shape[1]):
+            powers[:, degree] = powers[:, degree - 1] * values
+        return powers
+
+    # Trend at any (lon, lat) arrays, in chunks of chunk_size points; keeps the input shape
+    def evaluate(self, lon, lat, chunk_size=1_000_000):
+        lon, lat = np.broadcast_arrays(np.asarray(lon, dtype=np.float64), np.asarray(lat, dtype=np.float64))
+        flat_lon, flat_lat = lon.ravel(), lat.ravel()
+        trend = np.empty(len(flat_lon))
+        for start in range(0, len(flat_lon), chunk_size):
+            x_powers = self._powers(flat_lon[start:start + chunk_size])
+            y_powers = self._powers(flat_lat[start:start + chunk_size])
+            monomials = x_powers[:, self.powers[:, 0]] * y_powers[:, self.powers[:, 1]]
+            trend[start:start + chunk_size] = monomials @ self.coefficients + self.intercept
+        return trend.reshape(lon.shape)
+
+    def save(self, path=TREND_PATH):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'w') as file:
+            json.dump({
+                'powers': self.powers.tolist(),
+                'coefficients': self.coefficients.tolist(),
+                'intercept': self.intercept,
+            }, file, indent=2)
+
+    @classmethod
+    def load(cls, path=TREND_PATH):
+        with open(path) as file:
+            trend = json.load(file)
+        return cls(trend['powers'], trend['coefficients'], trend['intercept'])
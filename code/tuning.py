@@ -0,0 +1,271 @@
+import os
+import json
+import time
+import warnings
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from sklearn.model_selection import ParameterSampler, ParameterGrid
+from skgstat import DirectionalVariogram, OrdinaryKriging
+from pair_cache import CACHE_DIR, PairCache, CachedDirectionalVariogram
+from loocv import loocv
+from features import FEATURES_PATH, COORDINATES, TARGET, load_features, dense_columns
+
+LOG_PATH = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'model', 'ok_tuning.jsonl'))
+
+# Search space of the Ordinary Kriging tuning in model_development.ipynb
+PARAM_DIST = {
+    'min_points': range(10, 21),
+    'max_points': range(20, 41),
+    'mode': ['exact', 'estimate'],
+    'precision': range(75, 126),
+    'n_lags': range(10, 21),
+    'model': ['spherical', 'exponential', 'gaussian'],
+    'azimuth': [0, 45, 90, 135, 180],
+    'tolerance': [30.0, 45.0, 60.0],
+    'bandwidth': ['q33', 'q50', 'q67']}
+
+VARIOGRAM_PARAMS = ['model', 'n_lags', 'azimuth', 'tolerance', 'bandwidth']
+KRIGING_PARAMS = ['min_points', 'max_points', 'mode', 'precision']
+
+# 'holdout' refits the candidate's OrdinaryKriging per held-out well; 'loo' scores
+# every well at once with the closed-form global-neighbourhood LOO in loocv.py
+SCORINGS = ['holdout', 'loo']
+
+# Set once per worker process by _init_worker
+_coords = None
+_vals = None
+_pair_cache = None
+
+
+def load_samples(path=FEATURES_PATH):
+    matrix, feature_names = load_features(path)
+    coords = dense_columns(matrix, feature_names, COORDINATES)
+    vals = dense_columns(matrix, feature_names, [TARGET]).ravel()
+    return coords, vals
+
+
+# Plain python values so candidates round-trip through JSON unchanged
+def clean_params(params):
+    return {key: value.item() if isinstance(value, np.generic) else value
+            for key, value in params.items()}
+
+
+def params_key(params):
+    return json.dumps(clean_params(params), sort_keys=True)
+
+
+# Grid around the best random-search candidate, as refined in model_development.ipynb
+def refine_grid(best_params):
+    param_grid = {
+        'min_points': [best_params['min_points'] - 2,
+                       best_params['min_points'],
+                       best_params['min_points'] + 2],
+        'max_points': [best_params['max_points'] - 5,
+                       best_params['max_points'],
+                       best_params['max_points'] + 5],
+        'precision': [best_params['precision'] - 10,
+                      best_params['precision'],
+                      best_params['precision'] + 10],
+        'n_lags': [best_params['n_lags'] - 2,
+                   best_params['n_lags'],
+                   best_params['n_lags'] + 2],
+        'azimuth': [best_params['azimuth']],
+        'tolerance': [best_params['tolerance']],
+        'bandwidth': [best_params['bandwidth']],
+        'mode': [best_params['mode']],
+        'model': [best_params['model']]}
+    return [clean_params(params) for params in ParameterGrid(param_grid)]
+
+
+# Candidate variogram, reusing the pairwise distances and angles of pair_cache if given
+def build_variogram(coords, vals, params, pair_cache=None):
+    variogram_params = {key: params[key] for key in VARIOGRAM_PARAMS if key in params}
+    if pair_cache is not None:
+        return CachedDirectionalVariogram(pair_cache, values=vals, **variogram_params)
+    return DirectionalVariogram(coordinates=coords, values=vals, **variogram_params)
+
+
+# Indices held out at one budget. The seed depends only on the search seed and the
+# budget, so every candidate of a rung is scored on the same wells.
+def holdout_indices(n_samples, budget, seed):
+    if budget is None or budget >= n_samples:
+        return np.arange(n_samples)
+    rng = np.random.default_rng([seed, budget])
+    return np.sort(rng.choice(n_samples, size=budget, replace=False))
+
+
+# Leave-one-out RMSE over the held-out wells. Unlike skgstat's jacknife, each
+# prediction uses the candidate's own OrdinaryKriging settings.
+def holdout_rmse(variogram, params, indices):
+    coords, vals = variogram.coordinates, variogram.values
+    kriging_params = {key: params[key] for key in KRIGING_PARAMS if key in params}
+
+    errors = np.empty(len(indices))
+    for i, idx in enumerate(indices):
+        ok = OrdinaryKriging(
+            variogram,
+            coordinates=np.delete(coords, idx, axis=0),
+            values=np.delete(vals, idx, axis=0),
+            **kriging_params)
+        errors[i] = ok.transform([coords[idx][0]], [coords[idx][1]])[0] - vals[idx]
+    return float(np.sqrt(np.nanmean(errors ** 2)))
+
+
+def _init_worker(coords, vals, cache_dir):
+    global _coords, _vals, _pair_cache
+    _coords, _vals = coords, vals
+    _pair_cache = PairCache(coords, cache_dir) if cache_dir else None
+    warnings.filterwarnings('ignore')
+
+
+def _score_candidate(task):
+    params, scoring, budget, seed = task
+    start = time.perf_counter()
+    try:
+        variogram = build_variogram(_coords, _vals, params, _pair_cache)
+        if scoring == 'loo':
+            score = loocv(variogram)['rmse']
+        else:
+            score = holdout_rmse(variogram, params, holdout_indices(len(_vals), budget, seed))
+        error = None
+    except Exception as exc:
+        score, error = float('inf'), f'{type(exc).__name__}: {exc}'
+    return {'score': score if np.isfinite(score) else float('inf'),
+            'error': error,
+            'seconds': round(time.perf_counter() - start, 3)}
+
+
+# Append-only JSONL log of scored (stage, scoring, budget, seed, candidate) entries; a rerun
+# with the same log skips everything already recorded.
+class ResultsLog:
+    def __init__(self, path=LOG_PATH):
+        self.path = path
+        self.results = {}
+        if path and os.path.exists(path):
+            with open(path) as file:
+                for line in file:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # Last line of an interrupted run
+                        continue
+                    self.results[self._key(entry['stage'], entry['scoring'], entry['budget'], entry['seed'], entry['params'])] = entry
+
+    @staticmethod
+    def _key(stage, scoring, budget, seed, params):
+        return stage, scoring, budget, seed, params_key(params)
+
+    def get(self, stage, scoring, budget, seed, params):
+        return self.results.get(self._key(stage, scoring, budget, seed, params))
+
+    def append(self, entry):
+        self.results[self._key(entry['stage'], entry['scoring'], entry['budget'], entry['seed'], entry['params'])] = entry
+        if self.path:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(self.path, 'a') as file:
+                file.write(json.dumps(entry) + '\n')
+                file.flush()
+                os.fsync(file.fileno())
+
+
+# Holdout budgets of successive halving: min_budget, min_budget * eta, ... up to all wells
+def halving_budgets(n_samples, min_budget, eta):
+    budgets = []
+    budget = min_budget
+    while budget < n_samples:
+        budgets.append(budget)
+        budget *= eta
+    budgets.append(n_samples)
+    return budgets
+
+
+# Score candidates in parallel with successive halving: every candidate is scored
+# on a small holdout, the best 1/eta move on to a holdout eta times larger, until
+# the survivors are scored on every well. min_budget=None scores all candidates
+# on every well. Pairwise distances and angles come from the PairCache in cache_dir
+# (None recomputes them per candidate). scoring='loo' scores every well in one pass,
+# so there is a single rung. Returns (best_params, best_score, rung results).
+def search(candidates, coords, vals, stage='search', scoring='holdout', min_budget=None, eta=3,
+           seed=42, workers=None, log_path=LOG_PATH, cache_dir=CACHE_DIR):
+    if scoring not in SCORINGS:
+        raise ValueError(f'Unknown scoring: {scoring}')
+
+    coords, vals = np.asarray(coords, dtype=float), np.asarray(vals, dtype=float).ravel()
+    candidates = [clean_params(params) for params in candidates]
+    log = ResultsLog(log_path)
+    if cache_dir:
+        # Build once here; the workers only memory-map it
+        PairCache(coords, cache_dir)
+
+    n_samples = len(vals)
+    if min_budget and scoring == 'holdout':
+        budgets = halving_budgets(n_samples, min_budget, eta)
+    else:
+        budgets = [n_samples]
+
+    rungs = []
+    survivors = candidates
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(coords, vals, cache_dir)) as executor:
+        for rung, budget in enumerate(budgets):
+            pending = [params for params in survivors if log.get(stage, scoring, budget, seed, params) is None]
+            tasks = [(params, scoring, budget, seed) for params in pending]
+            for params, result in zip(pending, executor.map(_score_candidate, tasks)):
+                log.append({'stage': stage, 'scoring': scoring, 'rung': rung, 'budget': budget, 'seed': seed,
+                            'params': params, **result})
+
+            scored = sorted(((log.get(stage, scoring, budget, seed, params)['score'], i, params)
+                             for i, params in enumerate(survivors)), key=lambda item: item[:2])
+            rungs.append([{'params': params, 'score': score} for score, _, params in scored])
+
+            keep = max(1, len(scored) // eta) if rung < len(budgets) - 1 else len(scored)
+            survivors = [params for _, _, params in scored[:keep]]
+
+    best = rungs[-1][0]
+    return best['params'], best['score'], rungs
+
+
+# Random search over PARAM_DIST followed by the refined grid around its winner
+def tune(coords, vals, n_iter=20, random_state=42, scoring='holdout', min_budget=None, eta=3,
+         seed=42, workers=None, log_path=LOG_PATH, cache_dir=CACHE_DIR):
+    random_params = list(ParameterSampler(PARAM_DIST, n_iter=n_iter, random_state=random_state))
+    best_params, best_score, _ = search(random_params, coords, vals, stage='random',
+                                        scoring=scoring, min_budget=min_budget, eta=eta, seed=seed,
+                                        workers=workers, log_path=log_path, cache_dir=cache_dir)
+    print('RandomizedSearch')
+    print(best_params)
+    print(best_score)
+
+    best_params, best_score, _ = search(refine_grid(best_params), coords, vals, stage='grid',
+                                        scoring=scoring, min_budget=min_budget, eta=eta, seed=seed,
+                                        workers=workers, log_path=log_path, cache_dir=cache_dir)
+    print('GridSearch')
+    print(best_params)
+    print(best_score)
+    return best_params, best_score
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Tune the Ordinary Kriging hyperparameters.')
+    parser.add_argument('--data', default=FEATURES_PATH)
+    parser.add_argument('--log', default=LOG_PATH, help='resumable JSONL results log')
+    parser.add_argument('--n-iter', type=int, default=20, help='random search candidates')
+    parser.add_argument('--scoring', choices=SCORINGS, default='holdout')
+    parser.add_argument('--min-budget', type=int, default=None,
+                        help='held-out wells in the first halving rung (default: no halving)')
+    parser.add_argument('--eta', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--pair-cache', default=CACHE_DIR,
+                        help="pairwise distance/angle cache directory ('' to disable)")
+    args = parser.parse_args(argv)
+
+    coords, vals = load_samples(args.data)
+    tune(coords, vals, n_iter=args.n_iter, random_state=args.seed, scoring=args.scoring,
+         min_budget=args.min_budget, eta=args.eta, seed=args.seed, workers=args.workers,
+         log_path=args.log, cache_dir=args.pair_cache)
+
+
+if __name__ == '__main__':
+    main()
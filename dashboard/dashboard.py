@@ -1,81 +1,159 @@
+import os
 import numpy as np
 import pandas as pd
 import dash
 import dash_bootstrap_components as dbc
-from dash import dcc, html, Input, Output, dash_table
+from dash import dcc, html, Input, Output, State, dash_table
 import plotly.express as px
 import plotly.graph_objects as go
 import json
+from functools import lru_cache
+from well_store import data_path, load_well_store
+from figure_cache import FigureCache
+from well_index import WellIndex
+from well_aggregates import WellAggregates
+from well_layers import WellLayer, merge_view, view_bounds, cluster_level
+from grid_layers import (filter_geojson, county_layer, store_raster, frame_rasters, raster_image_layer,
+                         raster_colorbar)
+from grid_store import load_grid_store, store_path, MANIFEST
+from predict_service import PredictionService, register_routes
 
 # init app
 app = dash.Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP])
 
+# Batched point predictions (POST /api/predict) served next to the app; the kriging
+# artifact is loaded on the first request
+register_routes(app.server, PredictionService())
+
 # Load data
-grid_data = pd.read_parquet('../data/kriging_grid_data.parquet')
-well_data = pd.read_csv('../data/county_gaswells.csv')
-with open('../data/new_york_counties.json') as f:
+GRID_PATH = data_path('kriging_grid_data.parquet')
+WELL_PATH = data_path('county_gaswells.csv')
+with open(data_path('new_york_counties.json')) as f:
     ny_geojson = json.load(f)
 
-initial_data = well_data.head(100)  # Load only the first 100 rows
+# Conditional simulation summaries (simulation.py), present once the evaluation
+# notebook has added them to the grid; exceedance is stored in percent
+SIMULATION_COLUMNS = {
+    'sim_p10': ('P10', "plasma", "P10 (MCF)"),
+    'sim_p50': ('P50', "plasma", "P50 (MCF)"),
+    'sim_p90': ('P90', "plasma", "P90 (MCF)"),
+    'sim_exceedance': ('Exceedance', "Blues", "P(exceed) %"),
+}
+DEFAULT_SIMULATION_STAT = 'sim_exceedance'
 
+# Per-year (or rolling window) kriging frames of temporal.py, shown one at a time
+# with the period slider
+TEMPORAL_DIR = data_path('temporal')
+TEMPORAL_PATH = os.path.join(TEMPORAL_DIR, 'periods.json')
 
-# Process well data
-def process_well_data(well_data):
-    size = np.interp(well_data['gas_prod'], 
-                     (well_data['gas_prod'].min(), well_data['gas_prod'].max()), 
-                     (10, 30))
-    
-    well_data['marker_size'] = size
-    well_data['marker_border_size'] = size + 2
-
-    customdata = np.stack([
-        well_data['longitude'].round(2),
-        well_data['latitude'].round(2),
-        well_data['gas_prod'],
-        well_data['depth'],
-        well_data['elevation'],
-        well_data['well'],
-        well_data['status'],
-        well_data['County'],
-        well_data['geology']
-    ], axis=-1)
-
-    return well_data, customdata
-
-well_data, well_customdata = process_well_data(well_data)
-
-# Function to create field distribution pie chart
-def create_field_distribution_plot(data):
+# Grid variable, colormap and colorbar title behind every raster layer
+RASTER_VARIABLES = {
+    'kriging': ('predicted_value', "plasma", "Gas (MCF)"),
+    'error': ('error', "YlGn_r", "Variance"),
+}
+RASTER_VARIABLES.update({column: (column, colorscale, title)
+                         for column, (_, colorscale, title) in SIMULATION_COLUMNS.items()})
+# Raster layers are read at the pyramid level that shows the viewport in about this many cells per side
+RASTER_CELLS = 512
+
+# Raster of one layer over the tiles of a viewport, rendered once per (level, tiles)
+@lru_cache(maxsize=128)
+def viewport_raster(name, level, window):
+    variable, colorscale, title = RASTER_VARIABLES[name]
+    return store_raster(grid_store, variable, level, window, colorscale, title)
+
+# Colorbar of a raster layer; the range is the variable's range over the whole grid
+def raster_legend(name):
+    variable, colorscale, title = RASTER_VARIABLES[name]
+    limits = grid_store.variables[variable]
+    return raster_colorbar({'colorscale': colorscale, 'zmin': limits['min'], 'zmax': limits['max'], 'title': title})
+
+# Every frame of the temporal run rendered once, with the period labels; none before it has run
+def load_temporal_rasters():
+    if not os.path.exists(TEMPORAL_PATH):
+        return [], []
+    with open(TEMPORAL_PATH) as file:
+        summary = json.load(file)
+    frames = np.load(os.path.join(TEMPORAL_DIR, 'field.npy'), mmap_mode='r')
+    x, y = np.linspace(*summary['x']), np.linspace(*summary['y'])
+    return frame_rasters(frames, x, y, "plasma", "Gas (MCF)"), [period['label'] for period in summary['periods']]
+
+# Slider marks for the period labels, every fifth period and the last
+def period_marks(labels):
+    return {i: {'label': label, 'style': {'fontSize': '0.6rem'}}
+            for i, label in enumerate(labels) if i % 5 == 0 or i == len(labels) - 1}
+
+# Columns shown in the well table (the hover_* columns only feed the map)
+def table_columns(well_data):
+    return [column for column in well_data.columns if not column.startswith('hover_')]
+
+# Load the grid and well data plus everything derived from them (re-run when the files change)
+def load_map_data():
+    global grid_store, county_grid, county_geojson, well_data, well_customdata
+    global well_index, well_aggregates, well_layer, simulation_columns, temporal_rasters, temporal_labels
+
+    # Chunked tile pyramid of the kriging grid (rebuilt when the parquet export changes);
+    # only its manifest and per-county summary are loaded here
+    grid_store = load_grid_store(GRID_PATH)
+    simulation_columns = [column for column in SIMULATION_COLUMNS if column in grid_store.variables]
+    viewport_raster.cache_clear()
+
+    # Per-county summary of the kriging grid, drawn once per county polygon
+    county_grid = grid_store.county_summary
+    county_geojson = filter_geojson(ny_geojson, county_grid['GEOID'])
+
+    # Typed, memory-mapped well bundle with marker sizes and hover data precomputed
+    well_data, well_customdata = load_well_store(WELL_PATH)
+    well_index = WellIndex(well_data, record_columns=table_columns(well_data))
+    well_aggregates = WellAggregates(well_data)
+    well_layer = WellLayer(well_data, well_customdata)
+
+    # All period frames are pre-rendered, so moving the slider only swaps an image
+    temporal_rasters, temporal_labels = load_temporal_rasters()
+
+load_map_data()
+
+TABLE_PAGE_SIZE = 20
+
+# Function to create field distribution pie chart from pre-aggregated County counts
+def create_field_distribution_plot(county_counts):
     # Calculate the percentage of each County
-    field_counts = data['County'].value_counts(normalize=True) * 100
+    field_percentages = county_counts / county_counts.sum() * 100
     
     # Separate large and small slices
-    large_counts = field_counts[field_counts >= 5]
-    small_counts = field_counts[field_counts < 5]
-    
-    # Calculate the total percentage for the "Other" category
-    other_percentage = small_counts.sum()
+    large_counts = county_counts[field_percentages >= 5]
+    other_count = county_counts[field_percentages < 5].sum()
     
     # Combine large counts and "Other"
-    if other_percentage > 0:
-        field_counts = pd.concat([large_counts, pd.Series({'Other': other_percentage})])
-    
-    # Convert percentages back to absolute counts for plotting
-    field_counts_abs = data['County'].value_counts()[large_counts.index]
-    
-    # Add "Other" to the absolute counts
-    if 'Other' in field_counts.index:
-        field_counts_abs = pd.concat([field_counts_abs, pd.Series({'Other': data['County'].value_counts()[small_counts.index].sum()})])
+    field_counts_abs = large_counts
+    if other_count > 0:
+        field_counts_abs = pd.concat([large_counts, pd.Series({'Other': other_count})])
     
     # Create the pie chart
     fig = px.pie(field_counts_abs, values=field_counts_abs.values, names=field_counts_abs.index, title="Field Distribution")
     
     return fig
 
-# Function to create well status vs gas production box plot
-def create_well_status_vs_gas_plot(data):
-    fig = px.box(data, x='status', y='gas_prod', color='status', title="Well Status vs. Gas Production")
-    fig.update_layout(xaxis_title="Well Status", yaxis_title="Gas Production (MCF)")
+# Function to create well status vs gas production box plot from precomputed box statistics
+def create_well_status_vs_gas_plot(box_stats):
+    fig = go.Figure()
+    for stats, color in zip(box_stats, px.colors.qualitative.Plotly * 2):
+        fig.add_trace(go.Box(
+            name=stats['status'],
+            x=[stats['status']],
+            q1=[stats['q1']],
+            median=[stats['median']],
+            q3=[stats['q3']],
+            lowerfence=[stats['lowerfence']],
+            upperfence=[stats['upperfence']],
+            mean=[stats['mean']],
+            # Only the points beyond the fences are drawn, as px.box does
+            y=[stats['outliers']],
+            boxpoints='outliers',
+            marker_color=color,
+        ))
+    fig.update_layout(title="Well Status vs. Gas Production", legend_title_text='status',
+                      xaxis_title="Well Status", yaxis_title="Gas Production (MCF)")
     return fig
 
 # Function to create parallel coordinates plot
@@ -132,6 +210,8 @@ app.layout = dbc.Container([
         dbc.Col(
             html.Div([
                 dcc.Graph(id='choropleth-map', config={'scrollZoom': True}, style={'height': '300px'}),
+                # Last known map view and what the figure currently shows (see update_map)
+                dcc.Store(id='map-view'),
                 html.Div([
                     dbc.Card([
                         dbc.CardHeader("Map Layers", style={'fontSize': '0.7rem'}),
@@ -141,12 +221,31 @@ app.layout = dbc.Container([
                                 options=[
                                     {'label': 'Kriging', 'value': 'kriging'},
                                     {'label': 'Error Map', 'value': 'error'},
+                                    {'label': 'Simulation', 'value': 'simulation'},
+                                    {'label': 'By Year', 'value': 'temporal'},
                                     {'label': 'Gas Wells', 'value': 'wells'}
                                 ],
                                 value=['kriging'],
                                 style={'display': 'block', 'fontSize': '0.7rem'}
+                            ),
+                            dcc.Dropdown(
+                                id='simulation-stat',
+                                options=[{'label': label, 'value': column}
+                                         for column, (label, _, _) in SIMULATION_COLUMNS.items()],
+                                value=DEFAULT_SIMULATION_STAT,
+                                clearable=False,
+                                style={'fontSize': '0.6rem', 'marginTop': '4px'}
+                            ),
+                            dcc.RadioItems(
+                                id='render-mode',
+                                options=[
+                                    {'label': 'County', 'value': 'county'},
+                                    {'label': 'Raster', 'value': 'raster'}
+                                ],
+                                value='county',
+                                style={'display': 'block', 'fontSize': '0.7rem', 'marginTop': '4px'}
                             )
-                        ], style={'height':'75px', 'padding':'7px'})
+                        ], style={'height':'185px', 'padding':'7px'})
                     ], style={"width": "7rem"})
                 ], style={
                     'position': 'absolute',
@@ -155,6 +254,26 @@ app.layout = dbc.Container([
                     'z-index': '1000',
                     'background-color': 'rgba(255, 255, 255, 0.8)',
                     'width':'100px'
+                }),
+                # Period of the 'By Year' layer; range and marks follow the loaded run
+                # (update_period_slider)
+                html.Div([
+                    dcc.Slider(
+                        id='period-slider',
+                        min=0,
+                        max=max(len(temporal_labels) - 1, 0),
+                        step=1,
+                        value=max(len(temporal_labels) - 1, 0),
+                        marks=period_marks(temporal_labels)
+                    )
+                ], id='period-control', style={
+                    'position': 'absolute',
+                    'top': '5px',
+                    'right': '10px',
+                    'z-index': '1000',
+                    'background-color': 'rgba(255, 255, 255, 0.8)',
+                    'width': '220px',
+                    'display': 'none'
                 })
             ], style={'position': 'relative', 'height': '300px'}),
             width=4
@@ -168,10 +287,13 @@ app.layout = dbc.Container([
             html.Div([
                 dash_table.DataTable(
                     id='well-data-table',
-                    columns=[{"name": i, "id": i, "deletable": False, "selectable": True} for i in well_data.columns],
-                    data=initial_data.to_dict('records'),
-                    page_action='none',  # Disable pagination
-                    sort_action='native',  # Enable sorting by column
+                    columns=[{"name": i, "id": i, "deletable": False, "selectable": True} for i in table_columns(well_data)],
+                    page_action='custom',  # Pages are served by update_table
+                    page_current=0,
+                    page_size=TABLE_PAGE_SIZE,
+                    sort_action='custom',  # Sorting happens server-side
+                    sort_mode='single',
+                    sort_by=[],
                     style_table={'height': '250px', 'overflowY': 'scroll'},  # Adjust height for filters
                     style_cell={'textAlign': 'left', 'fontSize': 12, 'font-family': 'Arial'},
                     style_header={'backgroundColor': 'lightgrey', 'fontWeight': 'bold'},
@@ -211,12 +333,15 @@ app.layout = dbc.Container([
     ]),
 ], fluid=True)
 
-# Update map
-@app.callback(
-    Output('choropleth-map', 'figure'),
-    [Input('layer-toggle', 'value')]
-)
-def update_map(layers):
+# Raster layers shown for a layer selection, drawing order
+def raster_layers(layers, simulation_stat=None):
+    names = [name for name in ('kriging', 'error') if name in layers]
+    if 'simulation' in layers and simulation_stat in simulation_columns:
+        names.append(simulation_stat)
+    return names
+
+# Build the map figure for one combination of layers
+def build_map_figure(layers, render_mode='county', well_level=6, simulation_stat=None):
     fig = go.Figure()
 
     fig.update_layout(
@@ -225,82 +350,36 @@ def update_map(layers):
             zoom=6,  # Zoomed out to show the world by default
             center={"lat": 43.0, "lon": -77.0}  # World centered view
         ),
-        margin={"r": 0, "t": 0, "l": 0, "b": 0}
+        margin={"r": 0, "t": 0, "l": 0, "b": 0},
+        uirevision='map'  # Keep the user's view when the figure is swapped on zoom/pan
     )
 
-    if 'kriging' in layers:
-        kriging_layer = go.Choroplethmapbox(
-            geojson=ny_geojson,
-            locations=grid_data['GEOID'],  # Match this to your geojson IDs
-            z=grid_data['predicted_value'],
-            colorscale="plasma",
-            marker_opacity=0.7,
-            zmin=grid_data['predicted_value'].min(),
-            zmax=grid_data['predicted_value'].max(),
-            colorbar=dict(title="Gas (MCF)"),
-            featureidkey="properties.GEOID",  # Ensuring this aligns with geojson
-        )
-        fig.add_trace(kriging_layer)
-
-    if 'error' in layers:
-        error_layer = go.Choroplethmapbox(
-            geojson=ny_geojson,
-            locations=grid_data['GEOID'],  # Match this to your geojson IDs
-            z=grid_data['error'],
-            colorscale="YlGn_r",
-            marker_opacity=0.7,
-            zmin=grid_data['error'].min(),
-            zmax=grid_data['error'].max(),
-            colorbar=dict(title="Variance"),
-            featureidkey="properties.GEOID",  # Ensuring this aligns with geojson
-        )
-        fig.add_trace(error_layer)
-
-    if 'wells' in layers:
-        border_scatter = go.Scattermapbox(
-            lat=well_data['latitude'],
-            lon=well_data['longitude'],
-            mode='markers',
-            marker=go.scattermapbox.Marker(
-                size=well_data['marker_border_size'],
-                color='black',
-                opacity=0.8,
-                symbol='circle'
-            ),
-            showlegend=False,
-            hoverinfo='skip'
-        )
-        
-        well_scatter = go.Scattermapbox(
-            lat=well_data['latitude'],
-            lon=well_data['longitude'],
-            mode='markers',
-            marker=go.scattermapbox.Marker(
-                size=well_data['marker_size'],
-                color=well_data['gas_prod'],
-                colorscale='Plasma',
-                cmin=well_data['gas_prod'].min(),
-                cmax=well_data['gas_prod'].max(),
-                opacity=0.8,
-                symbol='circle'
-            ),
-            customdata=well_customdata,
-            hovertemplate=(
-                "Longitude: %{customdata[0]}<br>"
-                "Latitude: %{customdata[1]}<br>"
-                "Gas Produced: %{customdata[2]}<br>"
-                "Depth: %{customdata[3]}<br>"
-                "Elevation: %{customdata[4]}<br>"
-                "Well Type: %{customdata[5]}<br>"
-                "Well Status: %{customdata[6]}<br>"
-                "County: %{customdata[7]}<br>"
-                "Geology: %{customdata[8]}<extra></extra>"
-            ),
-            name='Well Locations',
-            showlegend=False,
-        )
+    # The simulation layer shows one summary statistic, if the grid has it
+    shown_simulation = simulation_stat if 'simulation' in layers and simulation_stat in simulation_columns else None
+
+    if render_mode == 'raster':
+        # The images themselves depend on the viewport and are added by update_map
+        fig.add_traces([raster_legend(name) for name in raster_layers(layers, simulation_stat)])
 
-        fig.add_traces([border_scatter, well_scatter])
+    else:
+        if 'kriging' in layers:
+            kriging_layer = county_layer(county_grid, county_geojson, 'predicted_value', "plasma", "Gas (MCF)")
+            fig.add_trace(kriging_layer)
+
+        if 'error' in layers:
+            error_layer = county_layer(county_grid, county_geojson, 'error', "YlGn_r", "Variance")
+            fig.add_trace(error_layer)
+
+        if shown_simulation:
+            _, colorscale, title = SIMULATION_COLUMNS[shown_simulation]
+            fig.add_trace(county_layer(county_grid, county_geojson, shown_simulation, colorscale, title))
+
+    # Period frames are images in both modes (added by update_map); all share one colorbar
+    if 'temporal' in layers and temporal_rasters:
+        fig.add_trace(raster_colorbar(temporal_rasters[0]))
+
+    if 'wells' in layers and well_level is not None:
+        fig.add_traces(well_layer.cluster_traces(well_level))
 
     if layers:
         fig.update_layout(
@@ -312,45 +391,135 @@ def update_map(layers):
 
     return fig
 
-# =============================================================================
-# SECTION 4 DATA TABLE
+# Map figures are memoized per layer combination (and well cluster level and
+# simulation statistic); only the initial view is built at startup, the rest on
+# first use. The period frame is added per request.
+# The grid is watched through its store's manifest, written last by every export,
+# and the temporal frames through periods.json, so a run made while the dashboard
+# is up (or the first one) is picked up
+map_figures = FigureCache(build_map_figure, [os.path.join(store_path(GRID_PATH), MANIFEST), WELL_PATH, TEMPORAL_PATH],
+                          on_change=load_map_data)
+map_figures.warm([(['kriging'], 'county', None, None)])
 
-# Callback to update the table based on selected County and Status
+# Update map; the well layer follows the zoom level and, when zoomed in, the viewport.
+# The map view is kept in the map-view store, since relayoutData only carries what
+# changed, together with the key of what the figure shows; events that leave the
+# key unchanged (a pan within one cluster level, a resize) do not resend the figure.
 @app.callback(
-    Output('well-data-table', 'data'),
-    [Input('county-filter', 'value'),
-     Input('status-filter', 'value')]
+    [Output('choropleth-map', 'figure'),
+     Output('map-view', 'data')],
+    [Input('layer-toggle', 'value'),
+     Input('render-mode', 'value'),
+     Input('choropleth-map', 'relayoutData'),
+     Input('simulation-stat', 'value'),
+     Input('period-slider', 'value')],
+    [State('map-view', 'data')]
 )
-def update_table(selected_counties, selected_statuses):
-    filtered_data = well_data
+def update_map(layers, render_mode='county', relayout_data=None, simulation_stat=DEFAULT_SIMULATION_STAT,
+               period=None, map_view=None):
+    layers = layers or []
+    map_figures.check_files()
+    view = merge_view(relayout_data, (map_view or {}).get('view'))
+    zoom, bbox = view_bounds(view)
+    well_level = cluster_level(zoom) if 'wells' in layers else None
+    # Only part of the cache key when the simulation layer is on
+    simulation_stat = simulation_stat if 'simulation' in layers else None
+    if 'temporal' in layers and temporal_rasters:
+        period = len(temporal_rasters) - 1 if period is None else min(int(period), len(temporal_rasters) - 1)
+    else:
+        period = None
+
+    key = [map_figures.version, sorted(layers), render_mode, well_level, simulation_stat, period]
+    if render_mode == 'raster':
+        level = grid_store.level_for(bbox, RASTER_CELLS)
+        window = grid_store.chunk_window(level, bbox)
+        key += [int(level), [int(value) for value in window]]
+    if 'wells' in layers and well_level is None:
+        key += [[float(value) for value in bbox]]
+    key = json.loads(json.dumps(key))
+    if map_view and map_view.get('key') == key:
+        return dash.no_update, {'view': view, 'key': key}
+
+    if 'wells' in layers and well_level is None:
+        fig = map_figures.get(layers, render_mode, None, simulation_stat)
+        fig['data'] += [trace.to_plotly_json() for trace in well_layer.detail_traces(well_layer.query(bbox))]
+    else:
+        fig = map_figures.get(layers, render_mode, well_level, simulation_stat)
+
+    # Raster images come from the pyramid level and tiles of the current viewport
+    if render_mode == 'raster':
+        fig['layout'].setdefault('mapbox', {})['layers'] = [
+            raster_image_layer(viewport_raster(name, level, window))
+            for name in raster_layers(layers, simulation_stat)]
 
-    if selected_counties:
-        filtered_data = filtered_data[filtered_data['County'].isin(selected_counties)]
+    # The selected period's pre-rendered frame, on top of the other rasters
+    if period is not None:
+        mapbox = fig['layout'].setdefault('mapbox', {})
+        mapbox['layers'] = mapbox.get('layers', []) + [raster_image_layer(temporal_rasters[period])]
+    return fig, {'view': view, 'key': key}
+
+# Period slider range and marks of the loaded temporal run (reloaded with the other
+# data when periods.json changes), shown while the 'By Year' layer is on
+@app.callback(
+    [Output('period-slider', 'max'),
+     Output('period-slider', 'marks'),
+     Output('period-slider', 'value'),
+     Output('period-control', 'style')],
+    [Input('layer-toggle', 'value')],
+    [State('period-slider', 'value'),
+     State('period-control', 'style')]
+)
+def update_period_slider(layers, period, style):
+    map_figures.check_files()
+    last = max(len(temporal_labels) - 1, 0)
+    period = last if period is None or period > last else period
+    visible = bool(temporal_labels) and 'temporal' in (layers or [])
+    return last, period_marks(temporal_labels), period, dict(style or {}, display='block' if visible else 'none')
 
-    if selected_statuses:
-        filtered_data = filtered_data[filtered_data['status'].isin(selected_statuses)]
+# =============================================================================
+# SECTION 4 DATA TABLE
 
-    # Return the filtered dataset (full or filtered)
-    return filtered_data.to_dict('records')
+# Callback to serve one sorted page of the wells matching the County and Status filters;
+# a filter change goes back to the first page, which the new result always has
+@app.callback(
+    [Output('well-data-table', 'data'),
+     Output('well-data-table', 'page_count'),
+     Output('well-data-table', 'page_current')],
+    [Input('county-filter', 'value'),
+     Input('status-filter', 'value'),
+     Input('well-data-table', 'page_current'),
+     Input('well-data-table', 'page_size'),
+     Input('well-data-table', 'sort_by')]
+)
+def update_table(selected_counties, selected_statuses, page_current, page_size, sort_by):
+    triggered = {trigger['prop_id'] for trigger in dash.callback_context.triggered}
+    if triggered & {'county-filter.value', 'status-filter.value'}:
+        page_current = 0
+    mask = well_index.cached_mask(County=selected_counties, status=selected_statuses)
+    records, page_count = well_index.page(mask, page_current, page_size or TABLE_PAGE_SIZE, sort_by)
+    return records, page_count, min(page_current or 0, page_count - 1)
 
 # =============================================================================
 # SECTION 1: GEO INSIGHTS
 
 # Callback to update the displayed plot based on dropdown selection
+# (driven by the filter values and the shared server-side view, not the table rows)
 @app.callback(
     Output('selected-plot', 'figure'),
     [Input('plot-selector', 'value'),
-     Input('well-data-table', 'data')]
+     Input('county-filter', 'value'),
+     Input('status-filter', 'value')]
 )
-def update_selected_plot(selected_plot, data):
-    df = pd.DataFrame(data)
-    
+def update_selected_plot(selected_plot, selected_counties, selected_statuses):
     if selected_plot == 'field-distribution-plot':
-        return create_field_distribution_plot(df)
+        return create_field_distribution_plot(
+            well_aggregates.county_counts(selected_counties, selected_statuses))
     elif selected_plot == 'well-status-vs-gas-plot':
-        return create_well_status_vs_gas_plot(df)
+        return create_well_status_vs_gas_plot(
+            well_aggregates.status_box_stats(selected_counties, selected_statuses))
     elif selected_plot == 'parallel-coordinates-plot':
-        return create_parallel_coordinates_plot(df)
+        return create_parallel_coordinates_plot(
+            well_index.view(County=selected_counties, status=selected_statuses))
 
 # Run app
 if __name__ == '__main__':
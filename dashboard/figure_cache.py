@@ -0,0 +1,66 @@
+import os
+import json
+import threading
+
+
+# Memoized map figures, decoded once per layer combination and filled on first use.
+# The cache is dropped (and the data reloaded) whenever a watched file changes,
+# appears or disappears; version counts the reloads.
+class FigureCache:
+    def __init__(self, build_figure, watch_paths, on_change=None):
+        self.build_figure = build_figure
+        self.watch_paths = list(watch_paths)
+        self.on_change = on_change
+        self._figures = {}
+        self._lock = threading.Lock()
+        self._stamp = self._file_stamp()
+        self.version = 0
+
+    def _file_stamp(self):
+        stamps = []
+        for path in self.watch_paths:
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                stamps.append(None)
+                continue
+            stamps.append((stat.st_mtime_ns, stat.st_size))
+        return tuple(stamps)
+
+    def check_files(self):
+        stamp = self._file_stamp()
+        if stamp == self._stamp:
+            return
+        with self._lock:
+            if stamp != self._stamp:
+                if self.on_change is not None:
+                    self.on_change()
+                self._figures.clear()
+                self._stamp = stamp
+                self.version += 1
+
+    @staticmethod
+    def make_key(layers, *options):
+        return (tuple(sorted(layers or [])),) + options
+
+    # Decoded once when built; callers get fresh containers for the parts they extend
+    # (the trace list and the layout's nested dicts), while the traces themselves,
+    # geojson included, are shared with the cache and must not be modified
+    def get(self, layers, *options):
+        self.check_files()
+        key = self.make_key(layers, *options)
+        cached = self._figures.get(key)
+        if cached is None:
+            cached = json.loads(self.build_figure(list(key[0]), *options).to_json())
+            with self._lock:
+                self._figures[key] = cached
+        layout = {name: dict(value) if isinstance(value, dict) else value
+                  for name, value in cached.get('layout', {}).items()}
+        return dict(cached, data=list(cached.get('data', [])), layout=layout)
+
+    def warm(self, keys):
+        for layers, *options in keys:
+            self.get(layers, *options)
+
+    def __len__(self):
+        return len(self._figures)
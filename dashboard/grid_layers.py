@@ -0,0 +1,158 @@
+import base64
+import struct
+import zlib
+from functools import lru_cache
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+from plotly.colors import get_colorscale, sample_colorscale
+
+# Quantiles kept per county for the kriging and error surfaces
+GRID_QUANTILES = {'q25': 0.25, 'q50': 0.50, 'q75': 0.75}
+
+
+# Collapse the kriging grid into one row per county (mean, max and quantiles)
+def summarize_grid_by_county(grid_data, columns=('predicted_value', 'error')):
+    grid = grid_data.dropna(subset=['GEOID'])
+    grouped = grid.groupby('GEOID')
+
+    summary = pd.DataFrame({'NAME': grouped['NAME'].first(), 'cells': grouped.size()})
+    for column in columns:
+        summary[f'{column}_mean'] = grouped[column].mean()
+        summary[f'{column}_max'] = grouped[column].max()
+        for name, q in GRID_QUANTILES.items():
+            summary[f'{column}_{name}'] = grouped[column].quantile(q)
+
+    return summary.reset_index()
+
+
+# Keep only the county polygons that actually carry grid values
+def filter_geojson(geojson, geoids):
+    geoids = set(geoids)
+    return {
+        'type': geojson['type'],
+        'features': [f for f in geojson['features'] if f['properties']['GEOID'] in geoids]
+    }
+
+
+# Build a county choropleth trace from the per-county summary
+def county_layer(summary, geojson, column, colorscale, title):
+    z = summary[f'{column}_mean']
+    customdata = summary[['NAME', f'{column}_mean', f'{column}_max',
+                          f'{column}_q25', f'{column}_q50', f'{column}_q75']].values
+
+    return go.Choroplethmapbox(
+        geojson=geojson,
+        locations=summary['GEOID'],
+        z=z,
+        colorscale=colorscale,
+        marker_opacity=0.7,
+        zmin=z.min(),
+        zmax=z.max(),
+        colorbar=dict(title=title),
+        featureidkey="properties.GEOID",
+        customdata=customdata,
+        hovertemplate=(
+            "County: %{customdata[0]}<br>"
+            "Mean: %{customdata[1]:,.0f}<br>"
+            "Max: %{customdata[2]:,.0f}<br>"
+            "Q25 / Q50 / Q75: %{customdata[3]:,.0f} / %{customdata[4]:,.0f} / %{customdata[5]:,.0f}"
+            "<extra></extra>"
+        ),
+    )
+
+
+# =============================================================================
+# RASTER RENDERING
+
+# 256-entry RGB lookup table for a plotly colorscale, computed once per name
+@lru_cache(maxsize=None)
+def colormap_lut(colorscale):
+    colors = sample_colorscale(get_colorscale(colorscale), np.linspace(0, 1, 256), colortype='tuple')
+    return np.round(np.array(colors) * 255).astype(np.uint8)
+
+
+# Minimal RGBA PNG encoder so the raster layer needs no imaging library
+def encode_png(rgba):
+    height, width, _ = rgba.shape
+    raw = np.hstack([np.zeros((height, 1), dtype=np.uint8), rgba.reshape(height, -1)]).tobytes()
+
+    def chunk(tag, data):
+        return (struct.pack('>I', len(data)) + tag + data +
+                struct.pack('>I', zlib.crc32(tag + data) & 0xffffffff))
+
+    header = struct.pack('>IIBBBBB', width, height, 8, 6, 0, 0, 0)
+    return (b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', header) +
+            chunk(b'IDAT', zlib.compress(raw, 9)) + chunk(b'IEND', b''))
+
+
+# Colour a 2D field with a fixed colormap and encode it as a PNG data URI
+def render_raster(array, colorscale, zmin=None, zmax=None, opacity=0.7):
+    valid = np.isfinite(array)
+    zmin = np.nanmin(array) if zmin is None else zmin
+    zmax = np.nanmax(array) if zmax is None else zmax
+
+    scaled = np.clip((np.nan_to_num(array, nan=zmin) - zmin) / ((zmax - zmin) or 1.0), 0, 1)
+    rgba = np.empty(array.shape + (4,), dtype=np.uint8)
+    rgba[..., :3] = colormap_lut(colorscale)[np.round(scaled * 255).astype(np.uint8)]
+    rgba[..., 3] = np.where(valid, int(opacity * 255), 0)
+
+    uri = 'data:image/png;base64,' + base64.b64encode(encode_png(rgba)).decode('ascii')
+    return uri, zmin, zmax
+
+
+# Raster of one grid_store variable over a block of its tiles (cells outside every
+# county left transparent), coloured against the variable's range over the whole grid
+def store_raster(store, name, level, window, colorscale, title):
+    values, x, y = store.read_window(name, level, window)
+    county, _, _ = store.read_window('county', level, window)
+    values[county < 0] = np.nan
+
+    zmin, zmax = store.variables[name]['min'], store.variables[name]['max']
+    uri, zmin, zmax = render_raster(values.T[::-1], colorscale, zmin, zmax)
+    return {'source': uri, 'bounds': (float(x[0]), float(y[0]), float(x[-1]), float(y[-1])), 'colorscale': colorscale,
+            'zmin': zmin, 'zmax': zmax, 'title': title}
+
+
+# Pre-render every frame of an (n_frames, nx, ny) stack on the x by y grid (as written
+# by temporal.krige_periods), coloured against the range over all frames so that
+# frames compare
+def frame_rasters(frames, x, y, colorscale, title):
+    zmin, zmax = float(np.nanmin(frames)), float(np.nanmax(frames))
+    rasters = []
+    for frame in frames:
+        uri, _, _ = render_raster(np.asarray(frame, dtype=np.float64).T[::-1], colorscale, zmin, zmax)
+        rasters.append({'source': uri, 'bounds': (float(x[0]), float(y[0]), float(x[-1]), float(y[-1])),
+                        'colorscale': colorscale, 'zmin': zmin, 'zmax': zmax, 'title': title})
+    return rasters
+
+
+# Mapbox image layer for a pre-rendered raster
+def raster_image_layer(raster):
+    lon_min, lat_min, lon_max, lat_max = raster['bounds']
+    return {
+        'sourcetype': 'image',
+        'source': raster['source'],
+        'below': 'traces',
+        'coordinates': [[lon_min, lat_max], [lon_max, lat_max],
+                        [lon_max, lat_min], [lon_min, lat_min]],
+    }
+
+
+# Image layers carry no colorbar, so attach one to an empty marker trace
+def raster_colorbar(raster):
+    return go.Scattermapbox(
+        lat=[None],
+        lon=[None],
+        mode='markers',
+        marker=dict(
+            colorscale=raster['colorscale'],
+            cmin=raster['zmin'],
+            cmax=raster['zmax'],
+            color=[raster['zmin']],
+            showscale=True,
+            colorbar=dict(title=raster['title'])
+        ),
+        hoverinfo='skip',
+        showlegend=False,
+    )
@@ -0,0 +1,233 @@
+import os
+import sys
+import json
+import shutil
+import warnings
+from functools import lru_cache
+import numpy as np
+import pandas as pd
+from well_store import data_path
+from grid_layers import summarize_grid_by_county
+
+STORE_VERSION = 1
+MANIFEST = 'manifest.json'
+COUNTY_SUMMARY = 'counties.parquet'
+# Grid columns stored as variables, plus any simulation summaries (sim_*)
+GRID_VARIABLES = ['predicted_value', 'error']
+
+
+# Directory of the store built from a grid parquet, next to it like well_store.store_path
+def store_path(grid_path):
+    return os.path.splitext(grid_path)[0] + '.store'
+
+
+# Mean of every factor x factor block (NaN cells ignored), for downsampling a level
+def block_mean(array, factor):
+    if factor == 1:
+        return np.asarray(array, dtype=np.float64)
+    array = np.asarray(array, dtype=np.float64)
+    padded_shape = [-(-size // factor) * factor for size in array.shape]
+    padded = np.full(padded_shape, np.nan)
+    padded[tuple(slice(0, size) for size in array.shape)] = array
+    if array.ndim == 1:
+        blocks, axis = padded.reshape(-1, factor), 1
+    else:
+        blocks, axis = padded.reshape(padded_shape[0] // factor, factor, padded_shape[1] // factor, factor), (1, 3)
+    # Blocks with no values at all stay NaN
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        return np.nanmean(blocks, axis=axis)
+
+
+def _chunk_path(path, level, ci, cj):
+    return os.path.join(path, f'level_{level}', f'{ci}_{cj}.npz')
+
+
+# Write a tile pyramid of (nx, ny) grids laid out like grid_predict.predict_grid
+# (variables[name][i, j] at x[i], y[j]) into path:
+#   level_<L>/<ci>_<cj>.npz  compressed chunk_size x chunk_size tiles of every variable
+#                            plus 'county' (int16 row of counties, -1 outside), with
+#                            level L the 2**L block mean of level 0
+#   axes.npz                 cell centre axes of every level
+#   counties.parquet         per-county summary of every variable (as summarize_grid_by_county)
+#   manifest.json            version, levels, chunking, variable ranges and the county table
+# county_ids is the (nx, ny) county row of every level-0 cell and counties the
+# GEOID/NAME table it indexes; both are required, the dashboard draws its county
+# layers from the summary. Levels are added until the grid fits in one chunk.
+# The store is built in a temporary directory and swapped in whole.
+def write_grid_store(path, x, y, variables, county_ids, counties, chunk_size=256, dtype=np.float32):
+    if county_ids is None or counties is None:
+        raise ValueError('a grid store needs the county of every cell (county_ids) and the county table')
+    x, y = np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+
+    levels, axes = [], {}
+    level, factor = 0, 1
+    while True:
+        level_x, level_y = block_mean(x, factor), block_mean(y, factor)
+        level_shape = (len(level_x), len(level_y))
+        chunks = (-(-level_shape[0] // chunk_size), -(-level_shape[1] // chunk_size))
+        os.makedirs(os.path.join(tmp_path, f'level_{level}'))
+
+        for ci in range(chunks[0]):
+            for cj in range(chunks[1]):
+                source = (slice(ci * chunk_size * factor, (ci + 1) * chunk_size * factor),
+                          slice(cj * chunk_size * factor, (cj + 1) * chunk_size * factor))
+                tile = {name: block_mean(values[source], factor).astype(dtype) for name, values in variables.items()}
+                # Counties are categorical: coarser levels keep the first cell of each block
+                tile['county'] = np.asarray(county_ids[source][::factor, ::factor], dtype=np.int16)
+                np.savez_compressed(_chunk_path(tmp_path, level, ci, cj), **tile)
+
+        levels.append({'level': level, 'factor': factor, 'shape': list(level_shape), 'chunks': list(chunks)})
+        axes[f'x_{level}'], axes[f'y_{level}'] = level_x, level_y
+        if max(chunks) == 1:
+            break
+        level, factor = level + 1, factor * 2
+    np.savez(os.path.join(tmp_path, 'axes.npz'), **axes)
+
+    # Per-county summary and value ranges from the level-0 cells inside the counties
+    frame = pd.DataFrame({name: np.asarray(values, dtype=np.float64).ravel() for name, values in variables.items()})
+    rows = np.asarray(county_ids).ravel()
+    inside = rows >= 0
+    table = counties.reset_index(drop=True)
+    frame = frame[inside].assign(GEOID=table['GEOID'].values[rows[inside]],
+                                 NAME=table['NAME'].values[rows[inside]])
+    summarize_grid_by_county(frame, list(variables)).to_parquet(os.path.join(tmp_path, COUNTY_SUMMARY))
+
+    manifest = {
+        'version': STORE_VERSION,
+        'chunk_size': chunk_size,
+        'bounds': [float(x[0]), float(y[0]), float(x[-1]), float(y[-1])],
+        'levels': levels,
+        'variables': {name: {'dtype': np.dtype(dtype).name,
+                             'min': float(np.nanmin(frame[name])), 'max': float(np.nanmax(frame[name]))}
+                      for name in variables},
+        'counties': counties[['GEOID', 'NAME']].astype(str).to_dict('list'),
+    }
+    with open(os.path.join(tmp_path, MANIFEST), 'w') as file:
+        json.dump(manifest, file, indent=2)
+
+    old_path = f'{path}.{os.getpid()}.old'
+    if os.path.exists(path):
+        os.replace(path, old_path)
+    os.replace(tmp_path, path)
+    shutil.rmtree(old_path, ignore_errors=True)
+    return path
+
+
+# (x, y, variables, county_ids, counties) of a kriging grid table (regular lon/lat
+# grid with GEOID/NAME from the county join), the arguments of write_grid_store
+def grid_arrays(grid_data):
+    lons, lon_idx = np.unique(grid_data['lon'].values, return_inverse=True)
+    lats, lat_idx = np.unique(grid_data['lat'].values, return_inverse=True)
+
+    names = GRID_VARIABLES + [column for column in grid_data.columns if column.startswith('sim_')]
+    variables = {}
+    for name in names:
+        values = np.full((len(lons), len(lats)), np.nan)
+        values[lon_idx, lat_idx] = grid_data[name].values
+        variables[name] = values
+
+    counties = (grid_data.dropna(subset=['GEOID']).drop_duplicates('GEOID')[['GEOID', 'NAME']]
+                .sort_values('GEOID').reset_index(drop=True))
+    rows = pd.Series(np.arange(len(counties)), index=counties['GEOID'])
+    county_ids = np.full((len(lons), len(lats)), -1, dtype=np.int16)
+    county_ids[lon_idx, lat_idx] = rows.reindex(grid_data['GEOID']).fillna(-1).astype(np.int16).values
+    return lons, lats, variables, county_ids, counties
+
+
+# Export a kriging grid table: the flat parquet and, from the same in-memory table,
+# its store next to it, so the dashboard never has to read the parquet
+def write_grid_export(grid_data, grid_path, chunk_size=256):
+    grid_data.to_parquet(grid_path, index=False)
+    return write_grid_store(store_path(grid_path), *grid_arrays(grid_data), chunk_size=chunk_size)
+
+
+# Build the store of an existing kriging_grid_data.parquet export
+def build_grid_store(grid_path, chunk_size=256):
+    return write_grid_store(store_path(grid_path), *grid_arrays(pd.read_parquet(grid_path)), chunk_size=chunk_size)
+
+
+# Open the store of a grid parquet. write_grid_export writes the store with the
+# parquet; exports made without it are converted once here (missing or older store).
+def load_grid_store(grid_path, cache_chunks=256):
+    path = store_path(grid_path)
+    manifest = os.path.join(path, MANIFEST)
+    if not os.path.exists(manifest) or os.path.getmtime(manifest) < os.path.getmtime(grid_path):
+        build_grid_store(grid_path)
+    return GridStore(path, cache_chunks)
+
+
+# Read side of the tile pyramid: only the manifest, the axes and the county summary
+# are loaded up front; tiles are decompressed on demand and kept in an LRU cache
+class GridStore:
+    def __init__(self, path, cache_chunks=256):
+        self.path = path
+        with open(os.path.join(path, MANIFEST)) as file:
+            self.manifest = json.load(file)
+        if self.manifest['version'] > STORE_VERSION:
+            raise ValueError(f'{path} has grid store version {self.manifest["version"]}, '
+                             f'this code reads up to {STORE_VERSION}')
+        self.chunk_size = self.manifest['chunk_size']
+        self.levels = self.manifest['levels']
+        self.variables = self.manifest['variables']
+        with np.load(os.path.join(path, 'axes.npz')) as axes:
+            self.axes = [(axes[f'x_{level["level"]}'], axes[f'y_{level["level"]}']) for level in self.levels]
+
+        self.county_summary = pd.read_parquet(os.path.join(path, COUNTY_SUMMARY))
+        self.chunk = lru_cache(maxsize=cache_chunks)(self._load_chunk)
+
+    def _load_chunk(self, level, ci, cj):
+        with np.load(_chunk_path(self.path, level, ci, cj)) as tile:
+            return {name: tile[name] for name in tile.files}
+
+    # Range of cells of a level inside (lon_min, lat_min, lon_max, lat_max)
+    def _cells(self, level, bounds):
+        x, y = self.axes[level]
+        lon_min, lat_min, lon_max, lat_max = bounds
+        i0, i1 = np.searchsorted(x, lon_min), np.searchsorted(x, lon_max, side='right')
+        j0, j1 = np.searchsorted(y, lat_min), np.searchsorted(y, lat_max, side='right')
+        return max(i0 - 1, 0), min(i1 + 1, len(x)), max(j0 - 1, 0), min(j1 + 1, len(y))
+
+    # Finest level that shows the viewport in at most max_cells cells per side
+    def level_for(self, bounds, max_cells=512):
+        for level in range(len(self.levels)):
+            i0, i1, j0, j1 = self._cells(level, bounds)
+            if max(i1 - i0, j1 - j0) <= max_cells:
+                return level
+        return len(self.levels) - 1
+
+    # Tiles of a level overlapping the viewport, as (ci0, ci1, cj0, cj1)
+    def chunk_window(self, level, bounds):
+        i0, i1, j0, j1 = self._cells(level, bounds)
+        if i1 <= i0 or j1 <= j0:
+            return 0, 0, 0, 0
+        size = self.chunk_size
+        return i0 // size, -(-i1 // size), j0 // size, -(-j1 // size)
+
+    # Variable of a block of tiles, (nx, ny), with its x and y axes
+    def read_window(self, name, level, window):
+        ci0, ci1, cj0, cj1 = window
+        x, y = self.axes[level]
+        size = self.chunk_size
+        x, y = x[ci0 * size:ci1 * size], y[cj0 * size:cj1 * size]
+        array = np.full((len(x), len(y)), np.nan, dtype=np.float64)
+        for ci in range(ci0, ci1):
+            for cj in range(cj0, cj1):
+                tile = self.chunk(level, ci, cj)[name]
+                i, j = (ci - ci0) * size, (cj - cj0) * size
+                array[i:i + tile.shape[0], j:j + tile.shape[1]] = tile
+        return array, x, y
+
+    # Variable over the viewport at the level matching its size, snapped to whole tiles
+    def read(self, name, bounds, max_cells=512):
+        level = self.level_for(bounds, max_cells)
+        return self.read_window(name, level, self.chunk_window(level, bounds))
+
+
+# Build step: python grid_store.py [grid parquet ...]
+if __name__ == '__main__':
+    for source in sys.argv[1:] or [data_path('kriging_grid_data.parquet')]:
+        print(build_grid_store(source))
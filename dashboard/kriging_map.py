@@ -5,40 +5,23 @@ import dash_bootstrap_components as dbc
 from dash import dcc, html, Input, Output
 import plotly.graph_objects as go
 import json
+from well_store import data_path, load_well_store
+from grid_layers import summarize_grid_by_county, filter_geojson, county_layer
 
 # init app
 app = dash.Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP])
 
 # Load data
-grid_data = pd.read_parquet('../data/kriging_grid_data.parquet')
-well_data = pd.read_csv('../data/clean_gaswells.csv')
-with open('../data/new_york_counties.json') as f:
+grid_data = pd.read_parquet(data_path('kriging_grid_data.parquet'))
+with open(data_path('new_york_counties.json')) as f:
     ny_geojson = json.load(f)
 
-# Process well data
-def process_well_data(well_data):
-    size = np.interp(well_data['gas_prod'], 
-                     (well_data['gas_prod'].min(), well_data['gas_prod'].max()), 
-                     (10, 30))
-    
-    well_data['marker_size'] = size
-    well_data['marker_border_size'] = size + 2
+# Per-county summary of the kriging grid, drawn once per county polygon
+county_grid = summarize_grid_by_county(grid_data)
+county_geojson = filter_geojson(ny_geojson, county_grid['GEOID'])
 
-    customdata = np.stack([
-        well_data['longitude'].round(2),
-        well_data['latitude'].round(2),
-        well_data['gas_prod'],
-        well_data['depth'],
-        well_data['elevation'],
-        well_data['well'],
-        well_data['status'],
-        well_data['field'],
-        well_data['geology']
-    ], axis=-1)
-
-    return well_data, customdata
-
-well_data, well_customdata = process_well_data(well_data)
+# Typed, memory-mapped well bundle with marker sizes and hover data precomputed
+well_data, well_customdata = load_well_store(data_path('clean_gaswells.csv'), label_column='field')
 
 # App layout
 app.layout = dbc.Container([
@@ -94,31 +77,11 @@ def update_map(layers):
     )
 
     if 'kriging' in layers:
-        kriging_layer = go.Choroplethmapbox(
-            geojson=ny_geojson,
-            locations=grid_data['GEOID'],  # Match this to your geojson IDs
-            z=grid_data['predicted_value'],
-            colorscale="plasma",
-            marker_opacity=0.7,
-            zmin=grid_data['predicted_value'].min(),
-            zmax=grid_data['predicted_value'].max(),
-            colorbar=dict(title="Gas (MCF)"),
-            featureidkey="properties.GEOID",  # Ensuring this aligns with geojson
-        )
+        kriging_layer = county_layer(county_grid, county_geojson, 'predicted_value', "plasma", "Gas (MCF)")
         fig.add_trace(kriging_layer)
 
     if 'error' in layers:
-        error_layer = go.Choroplethmapbox(
-            geojson=ny_geojson,
-            locations=grid_data['GEOID'],  # Match this to your geojson IDs
-            z=grid_data['error'],
-            colorscale="YlGn_r",
-            marker_opacity=0.7,
-            zmin=grid_data['error'].min(),
-            zmax=grid_data['error'].max(),
-            colorbar=dict(title="Variance"),
-            featureidkey="properties.GEOID",  # Ensuring this aligns with geojson
-        )
+        error_layer = county_layer(county_grid, county_geojson, 'error', "YlGn_r", "Variance")
         fig.add_trace(error_layer)
 
     if 'wells' in layers:
@@ -0,0 +1,269 @@
+import os
+import sys
+import math
+import time
+import argparse
+import threading
+from collections import OrderedDict
+import numpy as np
+from flask import Flask, request, jsonify
+
+# Model artifacts and the modelling code (artifact.py, trend.py), resolved from this
+# file like well_store.DATA_DIR
+ROOT_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+CODE_DIR = os.path.join(ROOT_DIR, 'code')
+MODEL_DIR = os.path.join(ROOT_DIR, 'model')
+DEFAULT_MODEL = os.path.join(MODEL_DIR, 'tuned_ordinary')
+DEFAULT_TREND = os.path.join(MODEL_DIR, 'trend.json')
+
+# Coordinates are snapped to this many degrees (~11 m) before lookup and prediction
+QUANTUM = 1e-4
+PREDICT_URL = '/api/predict'
+
+
+# LRU cache of (residual, variance, trend) per quantized coordinate
+class PredictionCache:
+    def __init__(self, maxsize=200_000):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    # Cached row of every key, None where it is missing
+    def get_many(self, keys):
+        rows = []
+        with self._lock:
+            for key in keys:
+                row = self._entries.get(key)
+                if row is not None:
+                    self._entries.move_to_end(key)
+                rows.append(row)
+            found = sum(row is not None for row in rows)
+            self.hits += found
+            self.misses += len(rows) - found
+        return rows
+
+    def put_many(self, keys, rows):
+        with self._lock:
+            for key, row in zip(keys, rows):
+                self._entries[key] = row
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self):
+        return {'size': len(self._entries), 'maxsize': self.maxsize, 'hits': self.hits,
+                'misses': self.misses, 'evictions': self.evictions}
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# Cache misses of concurrent requests collected into one kriging solve
+class _Batch:
+    def __init__(self):
+        self.keys = []
+        self.results = {}
+        self.error = None
+        self.full = threading.Event()
+        self.done = threading.Event()
+
+
+# Kriging estimates at arbitrary (lon, lat) points from a saved model artifact, with
+# the polynomial trend re-added. Points are snapped to a QUANTUM grid, so repeated
+# lookups are served from the LRU cache. Cache misses are coalesced: the first request
+# to miss opens a batch and waits batch_window seconds (or until max_batch points)
+# while concurrent requests add their misses, then the whole batch is kriged in one
+# vectorized transform. Points already being solved by another request are waited
+# for, not solved twice.
+class PredictionService:
+    def __init__(self, model_path=DEFAULT_MODEL, trend_path=DEFAULT_TREND, quantum=QUANTUM,
+                 cache_size=200_000, batch_window=0.002, max_batch=8192):
+        self.model_path = model_path
+        self.trend_path = trend_path
+        self.quantum = quantum
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self.cache = PredictionCache(cache_size)
+        self._model = None
+        self._trend = None
+        self._open = None
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._solve_lock = threading.Lock()
+        self.solves = 0
+        self.solved_points = 0
+        self.solve_seconds = 0.0
+
+    # Model and trend are loaded on first use (the artifact arrays are memory-mapped),
+    # so the dashboard starts without importing the modelling stack
+    def _load(self):
+        if self._model is None:
+            if CODE_DIR not in sys.path:
+                sys.path.append(CODE_DIR)
+            from artifact import load_artifact
+            from trend import TrendModel
+            self._trend = TrendModel.load(self.trend_path) if self.trend_path else None
+            self._model = load_artifact(self.model_path)
+        return self._model, self._trend
+
+    def quantize(self, lon, lat):
+        return np.rint(lon / self.quantum).astype(np.int64), np.rint(lat / self.quantum).astype(np.int64)
+
+    def _solve(self, batch):
+        try:
+            points = np.array(batch.keys, dtype=np.float64) * self.quantum
+            start = time.perf_counter()
+            # Models keep the variances of the last transform on themselves
+            with self._solve_lock:
+                model, trend = self._load()
+                residual = np.asarray(model.transform(points[:, 0], points[:, 1]), dtype=np.float64)
+                variance = np.asarray(model.sigma, dtype=np.float64)
+            trend_values = trend.evaluate(points[:, 0], points[:, 1]) if trend else np.zeros(len(points))
+            rows = list(zip(residual.tolist(), variance.tolist(), trend_values.tolist()))
+
+            batch.results = dict(zip(batch.keys, rows))
+            self.cache.put_many(batch.keys, rows)
+            self.solves += 1
+            self.solved_points += len(rows)
+            self.solve_seconds += time.perf_counter() - start
+        except Exception as exc:
+            batch.error = exc
+        finally:
+            with self._lock:
+                for key in batch.keys:
+                    self._inflight.pop(key, None)
+            batch.done.set()
+
+    # Rows for keys that missed the cache, solved in a shared batch
+    def _coalesce(self, keys):
+        lead = None
+        owners = {}
+        with self._lock:
+            for key in keys:
+                batch = self._inflight.get(key)
+                if batch is None:
+                    if self._open is None:
+                        self._open = lead = _Batch()
+                    batch = self._open
+                    batch.keys.append(key)
+                    self._inflight[key] = batch
+                owners[key] = batch
+            if self._open is not None and len(self._open.keys) >= self.max_batch:
+                self._open.full.set()
+
+        if lead is not None:
+            lead.full.wait(self.batch_window)
+            with self._lock:
+                if self._open is lead:
+                    self._open = None
+            self._solve(lead)
+
+        for batch in set(owners.values()):
+            batch.done.wait()
+            if batch.error is not None:
+                raise batch.error
+        return [owners[key].results[key] for key in keys]
+
+    # Prediction (kriged residual + trend), kriging variance and trend at every point
+    def predict(self, lon, lat):
+        lon = np.asarray(lon, dtype=np.float64).ravel()
+        lat = np.asarray(lat, dtype=np.float64).ravel()
+        if len(lon) != len(lat):
+            raise ValueError(f'got {len(lon)} longitudes and {len(lat)} latitudes')
+        if not (np.isfinite(lon).all() and np.isfinite(lat).all()):
+            raise ValueError('coordinates must be finite numbers')
+
+        qlon, qlat = self.quantize(lon, lat)
+        cells, inverse = np.unique(np.column_stack((qlon, qlat)), axis=0, return_inverse=True)
+        keys = list(map(tuple, cells.tolist()))
+        rows = self.cache.get_many(keys)
+
+        missing = [key for key, row in zip(keys, rows) if row is None]
+        if missing:
+            solved = dict(zip(missing, self._coalesce(missing)))
+            rows = [solved[key] if row is None else row for key, row in zip(keys, rows)]
+
+        table = np.array(rows, dtype=np.float64).reshape(-1, 3)[inverse.ravel()]
+        residual, variance, trend = table[:, 0], table[:, 1], table[:, 2]
+        return {'lon': lon, 'lat': lat, 'prediction': residual + trend,
+                'variance': variance, 'trend': trend, 'residual': residual}
+
+    def stats(self):
+        return {'cache': self.cache.stats(), 'solves': self.solves, 'solved_points': self.solved_points,
+                'solve_seconds': round(self.solve_seconds, 3), 'quantum': self.quantum}
+
+
+# (lon, lat, attributes) of a request body. Accepts {"lon": [...], "lat": [...]},
+# {"points": [[lon, lat], ...]} or {"points": [{"lon": ..., "lat": ..., <attributes>}, ...]};
+# attributes are the other fields of each point and are returned as given.
+def parse_points(payload):
+    if 'points' not in payload:
+        return payload['lon'], payload['lat'], None
+
+    points = payload['points']
+    if points and isinstance(points[0], dict):
+        lon = [point['lon'] for point in points]
+        lat = [point['lat'] for point in points]
+        attributes = [{key: value for key, value in point.items() if key not in ('lon', 'lat')}
+                      for point in points]
+        return lon, lat, attributes
+    coordinates = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    return coordinates[:, 0], coordinates[:, 1], None
+
+
+# JSON-safe list, NaN (no prediction) as null
+def _json_values(values):
+    return [None if math.isnan(value) else value for value in values.tolist()]
+
+
+# POST PREDICT_URL for predictions and GET PREDICT_URL/stats for cache statistics,
+# on the Dash app's Flask server or a standalone one
+def register_routes(server, service, url=PREDICT_URL):
+    def predict():
+        payload = request.get_json(force=True, silent=True) or {}
+        try:
+            lon, lat, attributes = parse_points(payload)
+            result = service.predict(lon, lat)
+        except (KeyError, TypeError, ValueError) as exc:
+            return jsonify(error=f'bad request: {exc}'), 400
+        except FileNotFoundError as exc:
+            return jsonify(error=f'model not available: {exc}'), 503
+
+        response = {name: _json_values(values) for name, values in result.items()}
+        if attributes is not None:
+            response['attributes'] = attributes
+        return jsonify(response)
+
+    def stats():
+        return jsonify(service.stats())
+
+    server.add_url_rule(url, 'predict_service_predict', predict, methods=['POST'])
+    server.add_url_rule(f'{url}/stats', 'predict_service_stats', stats, methods=['GET'])
+    return server
+
+
+def create_app(service):
+    return register_routes(Flask(__name__), service)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Serve kriging predictions over HTTP.')
+    parser.add_argument('--model', default=DEFAULT_MODEL, help='kriging artifact directory')
+    parser.add_argument('--trend', default=DEFAULT_TREND, help="trend.json ('' for none)")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8051)
+    parser.add_argument('--quantum', type=float, default=QUANTUM)
+    parser.add_argument('--cache-size', type=int, default=200_000)
+    parser.add_argument('--batch-window', type=float, default=0.002, help='seconds')
+    args = parser.parse_args(argv)
+
+    service = PredictionService(args.model, args.trend or None, args.quantum, args.cache_size, args.batch_window)
+    create_app(service).run(host=args.host, port=args.port, threaded=True)
+
+
+if __name__ == '__main__':
+    main()
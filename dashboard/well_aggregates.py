@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+
+
+# Linear-interpolated quantile of an already sorted array (same method as plotly's box)
+def sorted_quantile(values, q):
+    position = q * (len(values) - 1)
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (position - lower) * (values[upper] - values[lower])
+
+
+# Pre-aggregated County x status cubes built once from the well table, so the
+# pie and box plots are answered for any filter without scanning the rows.
+class WellAggregates:
+    def __init__(self, well_data):
+        county_codes, self.counties = pd.factorize(well_data['County'], sort=True)
+        status_codes, self.statuses = pd.factorize(well_data['status'], sort=True)
+        keep = (county_codes >= 0) & (status_codes >= 0)
+        county_codes, status_codes = county_codes[keep], status_codes[keep]
+        gas = well_data['gas_prod'].values[keep]
+
+        # Well counts per (County, status)
+        self.counts = np.zeros((len(self.counties), len(self.statuses)), dtype=np.int64)
+        np.add.at(self.counts, (county_codes, status_codes), 1)
+
+        # gas_prod sorted within each status, with the County code of every value
+        self.status_gas = []
+        for code in range(len(self.statuses)):
+            rows = np.flatnonzero(status_codes == code)
+            order = np.argsort(gas[rows], kind='stable')
+            self.status_gas.append((gas[rows][order], county_codes[rows][order]))
+
+    @staticmethod
+    def _select(categories, values):
+        if not values:
+            return np.ones(len(categories), dtype=bool)
+        return categories.isin(values)
+
+    # Well counts per County (largest first) for the selected counties and statuses
+    def county_counts(self, counties=None, statuses=None):
+        counts = self.counts[:, self._select(self.statuses, statuses)].sum(axis=1)
+        counts = pd.Series(counts, index=self.counties)[self._select(self.counties, counties)]
+        return counts[counts > 0].sort_values(ascending=False, kind='stable')
+
+    # Box statistics and outliers of gas_prod per status for the selected counties and statuses
+    def status_box_stats(self, counties=None, statuses=None):
+        county_mask = self._select(self.counties, counties)
+        status_mask = self._select(self.statuses, statuses)
+
+        stats = []
+        for code, status in enumerate(self.statuses):
+            gas, gas_counties = self.status_gas[code]
+            if not status_mask[code]:
+                continue
+            if counties:
+                gas = gas[county_mask[gas_counties]]
+            if len(gas) == 0:
+                continue
+
+            q1, median, q3 = (sorted_quantile(gas, q) for q in (0.25, 0.5, 0.75))
+            iqr = q3 - q1
+            # Fences are the most extreme values within 1.5 IQR; everything beyond
+            # them is an outlier, a contiguous run at either end of the sorted values
+            lower = np.searchsorted(gas, q1 - 1.5 * iqr)
+            upper = np.searchsorted(gas, q3 + 1.5 * iqr, side='right') - 1
+            stats.append({
+                'status': status,
+                'n': len(gas),
+                'mean': gas.mean(),
+                'q1': q1,
+                'median': median,
+                'q3': q3,
+                'lowerfence': gas[lower],
+                'upperfence': gas[upper],
+                'outliers': np.concatenate((gas[:lower], gas[upper + 1:])),
+            })
+        return stats
@@ -0,0 +1,100 @@
+from functools import lru_cache
+import numpy as np
+
+
+# Precomputed row indexes over the well table so filters, sorting and paging
+# never rescan or copy the full DataFrame.
+class WellIndex:
+    def __init__(self, well_data, index_columns=('County', 'status'), record_columns=None):
+        self.data = well_data.reset_index(drop=True)
+        self.n_rows = len(self.data)
+        self.record_columns = list(record_columns or self.data.columns)
+
+        # Row positions for every value of the indexed columns
+        self.positions = {
+            column: {value: rows for value, rows in self.data.groupby(column, sort=False, observed=True).indices.items()}
+            for column in index_columns
+        }
+
+        # Dense ranks (ties share a rank, missing values take the largest) and stable
+        # row orders per column. Descending ranks negate the present values only, so
+        # missing values sort last in both directions and ties keep their row order.
+        self.ranks = {}
+        self.desc_ranks = {}
+        self.sort_orders = {}
+        self.desc_sort_orders = {}
+        for column in self.data.columns:
+            values = self.data[column]
+            missing = values.isna().values
+            present = values.values[~missing]
+            if present.dtype.kind not in 'biuf':
+                present = np.asarray(present).astype(str)
+            ranks = np.empty(self.n_rows, dtype=np.int64)
+            ranks[~missing] = np.unique(present, return_inverse=True)[1].ravel()
+            ranks[missing] = ranks[~missing].max() + 1 if (~missing).any() else 0
+            self.ranks[column] = ranks
+            self.desc_ranks[column] = np.where(missing, ranks, -ranks)
+            self.sort_orders[column] = np.argsort(ranks, kind='stable')
+            self.desc_sort_orders[column] = np.argsort(self.desc_ranks[column], kind='stable')
+
+        # Filtered views are cached per filter tuple and shared by the table and plot callbacks
+        self._filtered = lru_cache(maxsize=128)(self._build_filtered)
+
+    # Boolean mask over all wells; None or [] means "no filter" on that column
+    def mask(self, **filters):
+        mask = np.ones(self.n_rows, dtype=bool)
+        for column, values in filters.items():
+            if not values:
+                continue
+            selected = np.zeros(self.n_rows, dtype=bool)
+            for value in values:
+                selected[self.positions[column].get(value, [])] = True
+            mask &= selected
+        return mask
+
+    # Hashable cache key for a set of filters, independent of selection order
+    @staticmethod
+    def filter_key(**filters):
+        return tuple((column, tuple(sorted(values or []))) for column, values in sorted(filters.items()))
+
+    def _build_filtered(self, key):
+        mask = self.mask(**{column: list(values) for column, values in key})
+        mask.flags.writeable = False
+        view = self.data[mask]
+        return mask, view
+
+    # Cached boolean mask for a filter combination (read-only, shared between callbacks)
+    def cached_mask(self, **filters):
+        return self._filtered(self.filter_key(**filters))[0]
+
+    # Cached filtered DataFrame for a filter combination; callers must not modify it
+    def view(self, **filters):
+        return self._filtered(self.filter_key(**filters))[1]
+
+    # Row positions of the filtered wells in the requested sort order
+    def sorted_rows(self, mask, sort_by=None):
+        if not sort_by:
+            return np.flatnonzero(mask)
+
+        if len(sort_by) == 1:
+            orders = self.desc_sort_orders if sort_by[0]['direction'] == 'desc' else self.sort_orders
+            order = orders[sort_by[0]['column_id']]
+            return order[mask[order]]
+
+        # Multi-column sort: lexsort over the precomputed ranks (last key is primary)
+        rows = np.flatnonzero(mask)
+        keys = []
+        for sort in reversed(sort_by):
+            ranks = self.desc_ranks if sort['direction'] == 'desc' else self.ranks
+            keys.append(ranks[sort['column_id']][rows])
+        return rows[np.lexsort(keys)]
+
+    # One page of records plus the total page count
+    def page(self, mask, page_current=0, page_size=20, sort_by=None):
+        rows = self.sorted_rows(mask, sort_by)
+        page_count = max(1, -(-len(rows) // page_size))
+        page_current = min(page_current or 0, page_count - 1)
+
+        start = page_current * page_size
+        records = self.data.iloc[rows[start:start + page_size]][self.record_columns].to_dict('records')
+        return records, page_count
@@ -0,0 +1,189 @@
+from functools import lru_cache
+import numpy as np
+import plotly.graph_objects as go
+
+# Zoom at which individual wells (with full hover data) replace the clusters
+WELL_DETAIL_ZOOM = 9
+# Target on-screen size of a cluster cell in pixels
+CLUSTER_PIXELS = 16
+# Default map view used before the first relayout event
+DEFAULT_VIEW = {'zoom': 6, 'center': {'lat': 43.0, 'lon': -77.0}, 'width': 500, 'height': 300}
+
+WELL_HOVERTEMPLATE = (
+    "Longitude: %{customdata[0]}<br>"
+    "Latitude: %{customdata[1]}<br>"
+    "Gas Produced: %{customdata[2]}<br>"
+    "Depth: %{customdata[3]}<br>"
+    "Elevation: %{customdata[4]}<br>"
+    "Well Type: %{customdata[5]}<br>"
+    "Well Status: %{customdata[6]}<br>"
+    "County: %{customdata[7]}<br>"
+    "Geology: %{customdata[8]}<extra></extra>"
+)
+
+
+# Map view after a relayout event. relayoutData only carries the keys that changed
+# (a pan may send no zoom, a resize only 'autosize'), so everything else is kept
+# from the previous view; DEFAULT_VIEW is only used before the first event.
+def merge_view(relayout_data, view=None):
+    view = dict(view or DEFAULT_VIEW)
+    relayout_data = relayout_data or {}
+    moved = False
+    if 'mapbox.zoom' in relayout_data:
+        view['zoom'], moved = relayout_data['mapbox.zoom'], True
+    if 'mapbox.center' in relayout_data:
+        view['center'], moved = relayout_data['mapbox.center'], True
+
+    derived = relayout_data.get('mapbox._derived', {}).get('coordinates')
+    if derived:
+        view['coordinates'] = derived
+    elif moved:
+        view.pop('coordinates', None)
+    return view
+
+
+# Zoom and (lon_min, lat_min, lon_max, lat_max) viewport of a map view
+def view_bounds(view):
+    zoom = view['zoom']
+    if view.get('coordinates'):
+        lons, lats = zip(*view['coordinates'])
+        return zoom, (min(lons), min(lats), max(lons), max(lats))
+
+    # No derived corners: approximate the viewport from the center and zoom
+    center = view['center']
+    degrees_per_pixel = 360 / (256 * 2 ** zoom)
+    half_width = view['width'] / 2 * degrees_per_pixel
+    half_height = view['height'] / 2 * degrees_per_pixel * np.cos(np.radians(center['lat']))
+    return zoom, (center['lon'] - half_width, center['lat'] - half_height,
+                  center['lon'] + half_width, center['lat'] + half_height)
+
+
+# Integer zoom level used to key the cluster layer (None once wells are drawn individually)
+def cluster_level(zoom):
+    level = int(np.floor(zoom))
+    return None if level >= WELL_DETAIL_ZOOM else max(level, 0)
+
+
+# Well marker layer backed by a uniform spatial grid index. Low zoom levels get
+# one marker per grid cluster; high zoom levels get the wells inside the viewport.
+class WellLayer:
+    def __init__(self, well_data, customdata, index_cell=0.1):
+        self.well_data = well_data
+        self.customdata = customdata
+        self.lon = well_data['longitude'].values
+        self.lat = well_data['latitude'].values
+        self.gas = well_data['gas_prod'].values
+        self.cmin, self.cmax = self.gas.min(), self.gas.max()
+
+        # Bucket the wells into index_cell x index_cell degree cells
+        self.index_cell = index_cell
+        self.origin = (self.lon.min(), self.lat.min())
+        ix, iy = self._cell(self.lon, self.lat)
+        self.n_y = iy.max() + 1
+        cell_ids = ix * self.n_y + iy
+        self.order = np.argsort(cell_ids, kind='stable')
+        cells, starts, counts = np.unique(cell_ids[self.order], return_index=True, return_counts=True)
+        self.cells = {cell: (start, start + count) for cell, start, count in zip(cells, starts, counts)}
+        self.n_x = ix.max() + 1
+
+        self.cluster_traces = lru_cache(maxsize=None)(self._cluster_traces)
+
+    def _cell(self, lon, lat):
+        ix = np.floor((lon - self.origin[0]) / self.index_cell).astype(np.int64)
+        iy = np.floor((lat - self.origin[1]) / self.index_cell).astype(np.int64)
+        return ix, iy
+
+    # Row positions of the wells inside a (lon_min, lat_min, lon_max, lat_max) box
+    def query(self, bbox):
+        lon_min, lat_min, lon_max, lat_max = bbox
+        (x0, x1), (y0, y1) = self._cell(np.array([lon_min, lon_max]), np.array([lat_min, lat_max]))
+        x0, x1 = max(x0, 0), min(x1, self.n_x - 1)
+        y0, y1 = max(y0, 0), min(y1, self.n_y - 1)
+
+        chunks = [self.order[slice(*self.cells[x * self.n_y + y])]
+                  for x in range(x0, x1 + 1) for y in range(y0, y1 + 1)
+                  if x * self.n_y + y in self.cells]
+        if not chunks:
+            return np.array([], dtype=np.int64)
+
+        rows = np.sort(np.concatenate(chunks))
+        inside = ((self.lon[rows] >= lon_min) & (self.lon[rows] <= lon_max) &
+                  (self.lat[rows] >= lat_min) & (self.lat[rows] <= lat_max))
+        return rows[inside]
+
+    # Grid clusters sized to roughly CLUSTER_PIXELS on screen at this zoom level
+    def clusters(self, level):
+        cell = CLUSTER_PIXELS * 360 / (256 * 2 ** level)
+        keys = np.stack([np.floor(self.lon / cell), np.floor(self.lat / cell)], axis=1)
+        _, inverse, counts = np.unique(keys, axis=0, return_inverse=True, return_counts=True)
+        inverse = inverse.ravel()
+
+        def mean(values):
+            return np.bincount(inverse, weights=values) / counts
+
+        return mean(self.lon), mean(self.lat), mean(self.gas), counts
+
+    def _cluster_traces(self, level):
+        lon, lat, gas, counts = self.clusters(level)
+        size = np.interp(np.log1p(counts), (0, np.log1p(counts.max()) or 1), (8, 30))
+
+        return (go.Scattermapbox(
+            lat=lat,
+            lon=lon,
+            mode='markers',
+            marker=go.scattermapbox.Marker(
+                size=size,
+                color=gas,
+                colorscale='Plasma',
+                cmin=self.cmin,
+                cmax=self.cmax,
+                opacity=0.8,
+                symbol='circle'
+            ),
+            customdata=np.stack([counts, gas.round(0)], axis=-1),
+            hovertemplate=(
+                "Wells: %{customdata[0]}<br>"
+                "Mean Gas Produced: %{customdata[1]:,.0f}<extra></extra>"
+            ),
+            name='Well Clusters',
+            showlegend=False,
+        ),)
+
+    # Individual well markers (border + coloured marker with full hover data) for some rows
+    def detail_traces(self, rows):
+        wells = self.well_data.iloc[rows]
+
+        border_scatter = go.Scattermapbox(
+            lat=wells['latitude'],
+            lon=wells['longitude'],
+            mode='markers',
+            marker=go.scattermapbox.Marker(
+                size=wells['marker_border_size'],
+                color='black',
+                opacity=0.8,
+                symbol='circle'
+            ),
+            showlegend=False,
+            hoverinfo='skip'
+        )
+
+        well_scatter = go.Scattermapbox(
+            lat=wells['latitude'],
+            lon=wells['longitude'],
+            mode='markers',
+            marker=go.scattermapbox.Marker(
+                size=wells['marker_size'],
+                color=wells['gas_prod'],
+                colorscale='Plasma',
+                cmin=self.cmin,
+                cmax=self.cmax,
+                opacity=0.8,
+                symbol='circle'
+            ),
+            customdata=self.customdata[rows],
+            hovertemplate=WELL_HOVERTEMPLATE,
+            name='Well Locations',
+            showlegend=False,
+        )
+
+        return border_scatter, well_scatter
@@ -0,0 +1,86 @@
+import os
+import sys
+import json
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+# Data directory resolved from this file, so workers can start from any cwd
+DATA_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data'))
+
+CATEGORICAL_COLUMNS = ['County', 'well', 'status', 'field', 'geology']
+# Bumped when the bundle layout changes so older bundles are rebuilt. Numeric columns
+# stay float64: all of them end up in the table, hover text or figure JSON, where
+# float32 values would show up widened (e.g. 1234.5999755859375).
+STORE_VERSION = 2
+
+
+def data_path(name):
+    return os.path.join(DATA_DIR, name)
+
+
+# Arrow bundle written next to the source CSV
+def store_path(csv_path):
+    return os.path.splitext(csv_path)[0] + '.arrow'
+
+
+# Read a well CSV, encode categoricals, materialize the marker and hover columns
+# and write an uncompressed Arrow IPC file that can be memory-mapped
+def build_well_store(csv_path, label_column='County'):
+    well_data = pd.read_csv(csv_path)
+
+    for column in CATEGORICAL_COLUMNS:
+        if column in well_data:
+            well_data[column] = well_data[column].astype('category')
+
+    size = np.interp(well_data['gas_prod'],
+                     (well_data['gas_prod'].min(), well_data['gas_prod'].max()),
+                     (10, 30))
+    well_data['marker_size'] = size
+    well_data['marker_border_size'] = size + 2
+    well_data['hover_longitude'] = well_data['longitude'].round(2)
+    well_data['hover_latitude'] = well_data['latitude'].round(2)
+
+    customdata_columns = ['hover_longitude', 'hover_latitude', 'gas_prod', 'depth', 'elevation',
+                          'well', 'status', label_column, 'geology']
+
+    table = pa.Table.from_pandas(well_data, preserve_index=False)
+    metadata = dict(table.schema.metadata or {})
+    metadata[b'customdata_columns'] = json.dumps(customdata_columns).encode('utf-8')
+    metadata[b'store_version'] = str(STORE_VERSION).encode('utf-8')
+    table = table.replace_schema_metadata(metadata)
+
+    # Write to a temporary file first so concurrent workers never read a partial bundle
+    path = store_path(csv_path)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    feather.write_feather(table, tmp_path, compression='uncompressed')
+    os.replace(tmp_path, path)
+    return path
+
+
+# Memory-map the Arrow bundle for a well CSV (rebuilding it if missing, older than the
+# CSV or from an older STORE_VERSION). Returns the well DataFrame and the hover customdata array.
+def load_well_store(csv_path, label_column='County'):
+    path = store_path(csv_path)
+    if not os.path.exists(path) or os.path.getmtime(path) < os.path.getmtime(csv_path):
+        build_well_store(csv_path, label_column)
+
+    table = pa.ipc.open_file(pa.memory_map(path, 'r')).read_all()
+    if table.schema.metadata.get(b'store_version') != str(STORE_VERSION).encode('utf-8'):
+        build_well_store(csv_path, label_column)
+        table = pa.ipc.open_file(pa.memory_map(path, 'r')).read_all()
+    customdata_columns = json.loads(table.schema.metadata[b'customdata_columns'])
+
+    # split_blocks keeps numeric columns as views onto the mapped pages
+    well_data = table.to_pandas(split_blocks=True)
+    customdata = well_data[customdata_columns].to_numpy(dtype=object)
+    return well_data, customdata
+
+
+# Build step: python well_store.py [csv ...]
+if __name__ == '__main__':
+    sources = sys.argv[1:] or [data_path('county_gaswells.csv'), data_path('clean_gaswells.csv')]
+    for source in sources:
+        label = 'County' if 'County' in pd.read_csv(source, nrows=0).columns else 'field'
+        print(build_well_store(source, label))